@@ -0,0 +1,1122 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from slot_grid import (
+    SLOT_MINUTES, DoctorSchedule, FreeSlotIndex, make_slot_id, minute_of, minutes_to_time, parse_slot_id,
+    time_to_minutes,
+)
+from spatial_index import GeoGridIndex, HAVERSINE_SLACK, KM_PER_DEGREE, haversine_km
+
+# Path of the SQLite database; unset keeps everything in process memory
+APPOINTMENT_DB = os.getenv("APPOINTMENT_DB")
+
+# How long an Idempotency-Key keeps replaying the appointment it created
+IDEMPOTENCY_KEY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 3600)))
+
+class SlotConflictError(Exception):
+    """The slot was booked or changed by another request since it was read"""
+
+class IdempotencyKeyReuseError(Exception):
+    """An Idempotency-Key was sent again with a different request body"""
+
+class AppointmentCancelledError(Exception):
+    """The appointment is cancelled, so it cannot be moved to another slot"""
+
+SPECIALTIES = [
+    "General Practitioner",
+    "Cardiologist",
+    "Dermatologist",
+    "Neurologist",
+    "Pediatrician",
+    "Psychiatrist",
+    "Orthopedist",
+    "Gynecologist",
+    "Urologist",
+    "Ophthalmologist",
+    "ENT Specialist",
+    "Dentist"
+]
+
+def build_mock_doctors() -> List[Dict[str, Any]]:
+    """Ten demo doctors around San Francisco, each with SLOT_MINUTES slots from 9 to 5 for the next 7 days"""
+    doctors = []
+    for i in range(1, 11):
+        doctor_id = str(uuid.uuid4())
+        specialty = SPECIALTIES[i % len(SPECIALTIES)]
+
+        # Create availability for the next 7 days
+        availability = []
+        for day in range(7):
+            current_date = (datetime.now() + timedelta(days=day)).strftime("%Y-%m-%d")
+            time_slots = []
+
+            # Create time slots from 9 AM to 5 PM
+            for start in range(9 * 60, 17 * 60, SLOT_MINUTES):
+                time_slots.append({
+                    "id": make_slot_id(doctor_id, current_date, start),
+                    "startTime": minutes_to_time(start),
+                    "endTime": minutes_to_time(start + SLOT_MINUTES),
+                    "isAvailable": True
+                })
+
+            availability.append({
+                "date": current_date,
+                "timeSlots": time_slots
+            })
+
+        doctors.append({
+            "id": doctor_id,
+            "name": f"Dr. Smith {i}",
+            "specialty": specialty,
+            "address": f"{i} Medical Street, Healthcare City",
+            "phone": f"+1-555-{i:03d}-{i*1111:04d}",
+            "email": f"doctor{i}@example.com",
+            "rating": 4.0 + (i % 10) / 10,
+            "location": {
+                "lat": 37.7749 + (i * 0.01),
+                "lng": -122.4194 + (i * 0.01)
+            },
+            "availability": availability,
+            "placeId": f"place_id_{i}"
+        })
+    return doctors
+
+class StorageBackend(ABC):
+    """
+    Interface the appointment API talks to.
+
+    Doctors, slots and appointments go in and come out as plain dicts shaped
+    like the API models. Returned dicts are copies (doctors excepted, which
+    are read-only to callers), so changes only persist through a write method.
+
+    Every slot carries a version that goes up on each change. Slots are only
+    claimed by compare-and-set against the version the caller read, so two
+    requests racing for one slot can never both win.
+
+    Every method is abstract, so a backend that misses one fails when it is
+    constructed rather than on the first request that needs it.
+    """
+
+    specialties: List[str] = SPECIALTIES
+
+    # Doctors
+    @abstractmethod
+    def add_doctor(self, doctor: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_doctor(self, doctor_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_doctors(self, doctor_ids: List[str], with_availability: bool = True) -> List[Dict[str, Any]]:
+        """Doctors in the order of doctor_ids; unknown ids are skipped"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def nearby_doctor_candidates(self, lat: float, lng: float, radius: float,
+                                 specialty: Optional[str]) -> Tuple[List[str], np.ndarray, np.ndarray, np.ndarray]:
+        """(ids, lats, lngs, haversine_km) for doctors that may lie within radius km"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def doctor_ids(self) -> List[str]:
+        raise NotImplementedError
+
+    # Slots
+    @abstractmethod
+    def find_time_slot(self, doctor_id: str, date: str, slot_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_slot_available(self, slot_id: str, available: bool) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def claim_slot(self, slot_id: str, version: int) -> bool:
+        """Mark a free slot as taken if it is still at version; False if another request got there first"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_availability(self, doctor_id: str, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                         only_free: bool = False, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        A doctor's days from start_date through end_date (either may be left
+        open), earliest first and at most `limit` of them. With only_free,
+        booked slots and days without a free slot are left out.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def earliest_free_slots(self, specialty: Optional[str], start: datetime, end: Optional[datetime], limit: int,
+                            doctor_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        The first `limit` free slots starting in [start, end), earliest first,
+        as {"doctorId", "date", "timeSlot"}; optionally only for doctor_ids.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def roll_availability(self, doctor_ids: List[str], first_date: str, last_date: str) -> Tuple[int, int]:
+        """
+        Move these doctors' availability window to [first_date, last_date]:
+        days before first_date are removed, and the slots of each doctor's
+        latest day are offered again on every later date through last_date.
+        Doctors without any availability are left alone. Returns
+        (slots added, slots removed).
+        """
+        raise NotImplementedError
+
+    # Appointments
+    @abstractmethod
+    def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_appointment(self, appointment: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def book_appointment(self, appointment: Dict[str, Any], slot_version: int,
+                         idempotency_key: Optional[str] = None,
+                         request_hash: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """
+        Claim the appointment's slot and store the appointment in one step.
+
+        Returns (appointment, created). A key already seen for the same user
+        replays the appointment it created instead of booking again. Raises
+        SlotConflictError when the slot was taken, and IdempotencyKeyReuseError
+        when the key was used for a different request.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_appointment(self, appointment_id: str, updated_at: str, notes: Optional[str] = None,
+                           time_slot: Optional[Dict[str, Any]] = None,
+                           date: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Change an appointment's notes and/or move it to `time_slot` on `date`
+        in one step: the new slot is claimed by compare-and-set against the
+        version in `time_slot`, and only then is the old slot freed. Returns
+        the updated appointment, or None if there is no such appointment.
+        Raises AppointmentCancelledError when moving a cancelled appointment
+        and SlotConflictError when the new slot was taken.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def cancel_appointment(self, appointment_id: str, updated_at: str) -> Optional[Dict[str, Any]]:
+        """
+        Cancel a scheduled appointment and free its slot in one step; an
+        appointment that is already cancelled is left alone, so its slot
+        (possibly booked by someone else since) is never freed twice.
+        Returns the appointment, or None if there is no such appointment.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_user_appointments(self, user_id: str, status: Optional[str] = None, start_date: Optional[str] = None,
+                               end_date: Optional[str] = None, after: Optional[Tuple[str, str, str]] = None,
+                               limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        A user's appointments ordered by (date, startTime, id), optionally
+        only those with `status`, dated within [start_date, end_date] and
+        ordered after the key `after`; at most `limit` of them.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def list_doctor_appointments(self, doctor_id: str, date: str) -> List[Dict[str, Any]]:
+        """A doctor's appointments on one date, ordered by start time"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def compact_appointments(self, cancelled_before: str, keys_created_before: float) -> Tuple[int, int]:
+        """
+        Delete appointments cancelled (last updated) before cancelled_before,
+        an ISO timestamp, along with their idempotency keys, and every key
+        created before keys_created_before (epoch seconds). Returns
+        (appointments removed, keys removed).
+        """
+        raise NotImplementedError
+
+def appointment_key(appointment: Dict[str, Any]) -> Tuple[str, str, str]:
+    """The order appointment lists are returned and paged in"""
+    return appointment["date"], appointment["startTime"], appointment["id"]
+
+class InMemoryStorage(StorageBackend):
+    """
+    Everything in process memory: fast, but per process and lost on restart.
+
+    Doctor profiles are dicts; their slots live in a compact DoctorSchedule
+    grid per doctor, addressed through the slot id itself, and the nested
+    availability dicts are only built when a caller asks for them.
+    """
+
+    def __init__(self, seed: bool = True):
+        # Doctor profiles, without availability
+        self.doctors: Dict[str, Dict[str, Any]] = {}
+        self.appointments: Dict[str, Dict[str, Any]] = {}
+        # Secondary appointment indexes: user id -> sorted appointment keys, (doctor id, date) -> appointment ids
+        self.user_appointments: Dict[str, List[Tuple[str, str, str]]] = {}
+        self.doctor_day_appointments: Dict[Tuple[str, str], Set[str]] = {}
+        self.users: Dict[str, Dict[str, Any]] = {}
+        # Spatial index over doctor locations, per specialty
+        self.doctor_index = GeoGridIndex()
+        # doctor id -> slot grid
+        self.schedules: Dict[str, DoctorSchedule] = {}
+        # Free slots of all doctors in time order, per specialty
+        self.free_slots = FreeSlotIndex()
+        # (user id, key) -> (request hash, appointment id, created at)
+        self.idempotency_keys: Dict[Tuple[str, str], Tuple[Optional[str], str, float]] = {}
+        # Serializes compare-and-set on slots across threads; grid reads take it too,
+        # since roll_availability resizes the grids from a worker thread
+        self._lock = threading.Lock()
+
+        if seed:
+            for doctor in build_mock_doctors():
+                self.add_doctor(doctor)
+
+    def add_doctor(self, doctor: Dict[str, Any]) -> None:
+        """Store a doctor and keep the spatial index and slot grid in sync"""
+        # Build the grid first: a slot that is off the grid raises before anything is stored
+        schedule = DoctorSchedule(doctor["id"])
+        schedule.add_days(doctor.get("availability") or [])
+        self.schedules[doctor["id"]] = schedule
+        self.doctors[doctor["id"]] = {key: value for key, value in doctor.items() if key != "availability"}
+        self.free_slots.register(doctor["id"], doctor["specialty"])
+        self.free_slots.extend(doctor["id"], schedule.free_slots())
+        self.doctor_index.insert(
+            doctor["id"],
+            doctor["location"]["lat"],
+            doctor["location"]["lng"],
+            doctor["specialty"]
+        )
+
+    def add_availability_day(self, doctor_id: str, day: Dict[str, Any]) -> None:
+        """Add one day of availability (nested API shape) to a doctor's slot grid"""
+        self.schedules[doctor_id].add_days([day])
+        for slot in day["timeSlots"]:
+            if slot.get("isAvailable", True):
+                self.free_slots.add(doctor_id, day["date"], time_to_minutes(slot["startTime"]))
+            else:
+                self.free_slots.remove(doctor_id, day["date"], time_to_minutes(slot["startTime"]))
+
+    def _with_availability(self, doctor: Dict[str, Any]) -> Dict[str, Any]:
+        """Doctor plus nested availability, under self._lock"""
+        return {**doctor, "availability": self.schedules[doctor["id"]].availability()}
+
+    def get_doctor(self, doctor_id: str) -> Optional[Dict[str, Any]]:
+        doctor = self.doctors.get(doctor_id)
+        if doctor is None:
+            return None
+        with self._lock:
+            return self._with_availability(doctor)
+
+    def get_doctors(self, doctor_ids: List[str], with_availability: bool = True) -> List[Dict[str, Any]]:
+        if not with_availability:
+            return [dict(self.doctors[doctor_id]) for doctor_id in doctor_ids if doctor_id in self.doctors]
+        with self._lock:
+            return [
+                self._with_availability(self.doctors[doctor_id])
+                for doctor_id in doctor_ids if doctor_id in self.doctors
+            ]
+
+    def nearby_doctor_candidates(self, lat, lng, radius, specialty):
+        index = self.doctor_index
+        rows, approx = index.query(lat, lng, radius, specialty)
+        return [index.ids[row] for row in rows], index.lat[rows], index.lng[rows], approx
+
+    def doctor_ids(self) -> List[str]:
+        return list(self.doctors)
+
+    def _locate_slot(self, slot_id: str) -> Optional[Tuple[DoctorSchedule, str, int]]:
+        """(schedule, date, start minutes) a slot id points at, or None for unknown ids"""
+        parsed = parse_slot_id(slot_id)
+        if parsed is None or parsed[0] not in self.schedules:
+            return None
+        doctor_id, date, start = parsed
+        return self.schedules[doctor_id], date, start
+
+    def find_time_slot(self, doctor_id: str, date: str, slot_id: str) -> Optional[Dict[str, Any]]:
+        parsed = parse_slot_id(slot_id)
+        if parsed is None or parsed[0] != doctor_id or parsed[1] != date or doctor_id not in self.schedules:
+            return None
+        with self._lock:
+            return self.schedules[doctor_id].get_slot(date, parsed[2])
+
+    def _set_slot_available(self, slot_id: str, available: bool) -> None:
+        located = self._locate_slot(slot_id)
+        if located is not None:
+            schedule, date, start = located
+            if schedule.set_available(date, start, available):
+                if available:
+                    self.free_slots.add(schedule.doctor_id, date, start)
+                else:
+                    self.free_slots.remove(schedule.doctor_id, date, start)
+
+    def set_slot_available(self, slot_id: str, available: bool) -> None:
+        with self._lock:
+            self._set_slot_available(slot_id, available)
+
+    def _claim_slot(self, slot_id: str, version: int) -> bool:
+        located = self._locate_slot(slot_id)
+        if located is None:
+            return False
+        schedule, date, start = located
+        if not schedule.claim(date, start, version):
+            return False
+        self.free_slots.remove(schedule.doctor_id, date, start)
+        return True
+
+    def claim_slot(self, slot_id: str, version: int) -> bool:
+        with self._lock:
+            return self._claim_slot(slot_id, version)
+
+    def get_availability(self, doctor_id, start_date=None, end_date=None, only_free=False, limit=None):
+        schedule = self.schedules.get(doctor_id)
+        if schedule is None:
+            return []
+        with self._lock:
+            return schedule.availability(start_date, end_date, only_free, limit)
+
+    def earliest_free_slots(self, specialty, start, end, limit, doctor_ids=None):
+        with self._lock:
+            found = self.free_slots.earliest(
+                specialty,
+                minute_of(start.date().isoformat(), start.hour * 60 + start.minute),
+                minute_of(end.date().isoformat(), end.hour * 60 + end.minute) if end is not None else None,
+                limit,
+                doctor_ids,
+            )
+            return [
+                {"doctorId": doctor_id, "date": date, "timeSlot": self.schedules[doctor_id].get_slot(date, minutes)}
+                for doctor_id, date, minutes in found
+            ]
+
+    def roll_availability(self, doctor_ids, first_date, last_date):
+        added = removed = 0
+        with self._lock:
+            for doctor_id in doctor_ids:
+                schedule = self.schedules.get(doctor_id)
+                if schedule is None:
+                    continue
+                for date, start in schedule.roll_forward(first_date, last_date):
+                    self.free_slots.add(doctor_id, date, start)
+                    added += 1
+                removed += schedule.drop_before(first_date)
+            # Past entries sit at the front of each specialty's index, so they go in one cut
+            self.free_slots.drop_before(minute_of(first_date))
+        return added, removed
+
+    def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        appointment = self.appointments.get(appointment_id)
+        return dict(appointment) if appointment is not None else None
+
+    def _store_appointment(self, appointment: Dict[str, Any]) -> None:
+        """Store an appointment and update the secondary indexes, under self._lock"""
+        previous = self.appointments.get(appointment["id"])
+        if previous is not None:
+            self._unindex_appointment(previous)
+        self.appointments[appointment["id"]] = dict(appointment)
+        insort(self.user_appointments.setdefault(appointment["userId"], []), appointment_key(appointment))
+        self.doctor_day_appointments.setdefault((appointment["doctorId"], appointment["date"]), set()).add(appointment["id"])
+
+    def _unindex_appointment(self, appointment: Dict[str, Any]) -> None:
+        keys = self.user_appointments.get(appointment["userId"], [])
+        key = appointment_key(appointment)
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+        if not keys:
+            self.user_appointments.pop(appointment["userId"], None)
+        day = (appointment["doctorId"], appointment["date"])
+        ids = self.doctor_day_appointments.get(day, set())
+        ids.discard(appointment["id"])
+        if not ids:
+            self.doctor_day_appointments.pop(day, None)
+
+    def save_appointment(self, appointment: Dict[str, Any]) -> None:
+        with self._lock:
+            self._store_appointment(appointment)
+
+    def book_appointment(self, appointment, slot_version, idempotency_key=None, request_hash=None):
+        with self._lock:
+            if idempotency_key is not None:
+                key = (appointment["userId"], idempotency_key)
+                seen = self.idempotency_keys.get(key)
+                if seen is not None and time.time() - seen[2] < IDEMPOTENCY_KEY_TTL_SECONDS:
+                    if seen[0] != request_hash:
+                        raise IdempotencyKeyReuseError(idempotency_key)
+                    return dict(self.appointments[seen[1]]), False
+
+            if not self._claim_slot(appointment["timeSlotId"], slot_version):
+                raise SlotConflictError(appointment["timeSlotId"])
+
+            self._store_appointment(appointment)
+            if idempotency_key is not None:
+                self.idempotency_keys[key] = (request_hash, appointment["id"], time.time())
+            return dict(appointment), True
+
+    def update_appointment(self, appointment_id, updated_at, notes=None, time_slot=None, date=None):
+        with self._lock:
+            appointment = self.appointments.get(appointment_id)
+            if appointment is None:
+                return None
+            appointment = dict(appointment)
+            if notes is not None:
+                appointment["notes"] = notes
+            if time_slot is not None:
+                if appointment["status"] == "cancelled":
+                    raise AppointmentCancelledError(appointment_id)
+                # Claim the new slot first, then free the old one
+                if not self._claim_slot(time_slot["id"], time_slot["version"]):
+                    raise SlotConflictError(time_slot["id"])
+                if appointment.get("timeSlotId"):
+                    self._set_slot_available(appointment["timeSlotId"], True)
+                appointment.update(date=date, timeSlotId=time_slot["id"], startTime=time_slot["startTime"],
+                                   endTime=time_slot["endTime"])
+            appointment["updatedAt"] = updated_at
+            self._store_appointment(appointment)
+            return dict(appointment)
+
+    def cancel_appointment(self, appointment_id, updated_at):
+        with self._lock:
+            appointment = self.appointments.get(appointment_id)
+            if appointment is None:
+                return None
+            if appointment["status"] == "scheduled":
+                appointment = {**appointment, "status": "cancelled", "updatedAt": updated_at}
+                if appointment.get("timeSlotId"):
+                    self._set_slot_available(appointment["timeSlotId"], True)
+                self._store_appointment(appointment)
+            return dict(appointment)
+
+    def list_user_appointments(self, user_id, status=None, start_date=None, end_date=None, after=None, limit=None):
+        with self._lock:
+            keys = self.user_appointments.get(user_id, [])
+            position = 0
+            if start_date is not None:
+                position = bisect_left(keys, (start_date,))
+            if after is not None:
+                position = max(position, bisect_right(keys, tuple(after)))
+            found = []
+            for index in range(position, len(keys)):
+                key = keys[index]
+                if (end_date is not None and key[0] > end_date) or (limit is not None and len(found) >= limit):
+                    break
+                appointment = self.appointments[key[2]]
+                if status is None or appointment["status"] == status:
+                    found.append(dict(appointment))
+            return found
+
+    def list_doctor_appointments(self, doctor_id, date):
+        with self._lock:
+            found = [dict(self.appointments[appointment_id])
+                     for appointment_id in self.doctor_day_appointments.get((doctor_id, date), ())]
+        return sorted(found, key=appointment_key)
+
+    def compact_appointments(self, cancelled_before, keys_created_before):
+        # Find candidates without the lock, then re-check each one under it
+        stale = [
+            appointment_id for appointment_id, appointment in list(self.appointments.items())
+            if appointment["status"] == "cancelled" and appointment["updatedAt"] < cancelled_before
+        ]
+        removed = set()
+        with self._lock:
+            for appointment_id in stale:
+                appointment = self.appointments.get(appointment_id)
+                if appointment is not None and appointment["status"] == "cancelled" \
+                        and appointment["updatedAt"] < cancelled_before:
+                    self._unindex_appointment(appointment)
+                    del self.appointments[appointment_id]
+                    removed.add(appointment_id)
+            keys = [
+                key for key, (_, appointment_id, created_at) in self.idempotency_keys.items()
+                if appointment_id in removed or created_at < keys_created_before
+            ]
+            for key in keys:
+                del self.idempotency_keys[key]
+        return len(removed), len(keys)
+
+class SQLiteStorage(StorageBackend):
+    """
+    SQLite-backed storage that survives restarts and is shared by every worker
+    pointed at the same file.
+
+    WAL mode lets readers run alongside the single writer. All SQL is constant
+    text with ? parameters, so sqlite3's statement cache reuses the prepared
+    statements across requests.
+    """
+
+    SCHEMA_VERSION = 2
+
+    SCHEMA = [
+        """CREATE TABLE IF NOT EXISTS doctors (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            specialty TEXT NOT NULL,
+            address TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT NOT NULL,
+            rating REAL NOT NULL,
+            lat REAL NOT NULL,
+            lng REAL NOT NULL,
+            place_id TEXT
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_specialty_lat ON doctors (specialty, lat)",
+        "CREATE INDEX IF NOT EXISTS idx_doctors_lat ON doctors (lat)",
+        """CREATE TABLE IF NOT EXISTS time_slots (
+            id TEXT PRIMARY KEY,
+            doctor_id TEXT NOT NULL REFERENCES doctors (id),
+            date TEXT NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            is_available INTEGER NOT NULL,
+            version INTEGER NOT NULL DEFAULT 0
+        )""",
+        "CREATE INDEX IF NOT EXISTS idx_time_slots_doctor_date ON time_slots (doctor_id, date, start_time)",
+        # Free slots in time order, for the earliest-slot search
+        "CREATE INDEX IF NOT EXISTS idx_time_slots_free ON time_slots (date, start_time) WHERE is_available = 1",
+        """CREATE TABLE IF NOT EXISTS appointments (
+            id TEXT PRIMARY KEY,
+            doctor_id TEXT NOT NULL REFERENCES doctors (id),
+            user_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time_slot_id TEXT,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            status TEXT NOT NULL,
+            symptoms TEXT,
+            notes TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )""",
+        # Covers the order user appointment lists are paged in
+        "CREATE INDEX IF NOT EXISTS idx_appointments_user_date ON appointments (user_id, date, start_time, id)",
+        "CREATE INDEX IF NOT EXISTS idx_appointments_doctor_date ON appointments (doctor_id, date)",
+        """CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id TEXT NOT NULL,
+            key TEXT NOT NULL,
+            request_hash TEXT,
+            appointment_id TEXT NOT NULL REFERENCES appointments (id),
+            created_at REAL NOT NULL,
+            PRIMARY KEY (user_id, key)
+        )""",
+    ]
+
+    # Statements that bring a database at schema version N up to N + 1
+    MIGRATIONS = {
+        1: ["ALTER TABLE time_slots ADD COLUMN version INTEGER NOT NULL DEFAULT 0"],
+    }
+
+    DOCTOR_COLUMNS = "id, name, specialty, address, phone, email, rating, lat, lng, place_id"
+    APPOINTMENT_COLUMNS = (
+        "id, doctor_id, user_id, date, time_slot_id, start_time, end_time, "
+        "status, symptoms, notes, created_at, updated_at"
+    )
+
+    def __init__(self, path: str, seed: bool = True):
+        self.path = path
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._create_schema()
+        if seed:
+            self._seed()
+
+    def _create_schema(self) -> None:
+        # BEGIN IMMEDIATE takes the write lock, so workers starting together migrate only once
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+                has_tables = self._conn.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'doctors'"
+                ).fetchone()[0]
+                if has_tables:
+                    while version in self.MIGRATIONS:
+                        for statement in self.MIGRATIONS[version]:
+                            self._conn.execute(statement)
+                        version += 1
+                    if version != self.SCHEMA_VERSION:
+                        raise RuntimeError(
+                            f"{self.path} has schema version {version}, expected {self.SCHEMA_VERSION}; "
+                            "migrate or remove the file"
+                        )
+                for statement in self.SCHEMA:
+                    self._conn.execute(statement)
+                self._conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _seed(self) -> None:
+        # BEGIN IMMEDIATE takes the write lock, so concurrent workers seed only once
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if self._conn.execute("SELECT 1 FROM doctors LIMIT 1").fetchone() is None:
+                    for doctor in build_mock_doctors():
+                        self._insert_doctor(doctor)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _insert_doctor(self, doctor: Dict[str, Any]) -> None:
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO doctors ({self.DOCTOR_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                doctor["id"], doctor["name"], doctor["specialty"], doctor["address"], doctor["phone"],
+                doctor["email"], doctor["rating"], doctor["location"]["lat"], doctor["location"]["lng"],
+                doctor.get("placeId"),
+            ),
+        )
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO time_slots (id, doctor_id, date, start_time, end_time, is_available, version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (slot["id"], doctor["id"], day["date"], slot["startTime"], slot["endTime"],
+                 int(slot["isAvailable"]), slot.get("version", 0))
+                for day in doctor.get("availability") or []
+                for slot in day["timeSlots"]
+            ],
+        )
+
+    def add_doctor(self, doctor: Dict[str, Any]) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._insert_doctor(doctor)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _doctor_from_row(self, row: sqlite3.Row, availability: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "name": row["name"],
+            "specialty": row["specialty"],
+            "address": row["address"],
+            "phone": row["phone"],
+            "email": row["email"],
+            "rating": row["rating"],
+            "location": {"lat": row["lat"], "lng": row["lng"]},
+            "availability": availability,
+            "placeId": row["place_id"],
+        }
+
+    def get_doctor(self, doctor_id: str) -> Optional[Dict[str, Any]]:
+        doctors = self.get_doctors([doctor_id])
+        return doctors[0] if doctors else None
+
+    def get_doctors(self, doctor_ids: List[str], with_availability: bool = True) -> List[Dict[str, Any]]:
+        if not doctor_ids:
+            return []
+        placeholders = ", ".join("?" * len(doctor_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.DOCTOR_COLUMNS} FROM doctors WHERE id IN ({placeholders})", doctor_ids
+            ).fetchall()
+            slot_rows = self._conn.execute(
+                "SELECT id, doctor_id, date, start_time, end_time, is_available, version FROM time_slots "
+                f"WHERE doctor_id IN ({placeholders}) ORDER BY doctor_id, date, start_time",
+                doctor_ids,
+            ).fetchall() if with_availability else []
+
+        availability: Dict[str, List[Dict[str, Any]]] = {}
+        for slot_row in slot_rows:
+            days = availability.setdefault(slot_row["doctor_id"], [])
+            if not days or days[-1]["date"] != slot_row["date"]:
+                days.append({"date": slot_row["date"], "timeSlots": []})
+            days[-1]["timeSlots"].append(self._slot_from_row(slot_row))
+
+        by_id = {
+            row["id"]: self._doctor_from_row(row, availability.get(row["id"], []) if with_availability else None)
+            for row in rows
+        }
+        return [by_id[doctor_id] for doctor_id in doctor_ids if doctor_id in by_id]
+
+    def nearby_doctor_candidates(self, lat, lng, radius, specialty):
+        limit = radius * HAVERSINE_SLACK
+        dlat = limit / KM_PER_DEGREE
+        sql = "SELECT id, lat, lng FROM doctors WHERE lat BETWEEN ? AND ?"
+        params: List[Any] = [lat - dlat, lat + dlat]
+
+        # Only bound longitude when the box neither reaches a pole nor wraps the antimeridian
+        lat_edge = abs(lat) + dlat
+        if lat_edge < 89.9:
+            dlng = limit / (KM_PER_DEGREE * math.cos(math.radians(lat_edge)))
+            if -180 <= lng - dlng and lng + dlng <= 180:
+                sql += " AND lng BETWEEN ? AND ?"
+                params += [lng - dlng, lng + dlng]
+        if specialty:
+            sql += " AND specialty = ?"
+            params.append(specialty)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        ids = [row[0] for row in rows]
+        lats = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        lngs = np.fromiter((row[2] for row in rows), dtype=np.float64, count=len(rows))
+        approx = haversine_km(lat, lng, lats, lngs)
+        keep = np.flatnonzero(approx <= limit)
+        return [ids[i] for i in keep], lats[keep], lngs[keep], approx[keep]
+
+    def doctor_ids(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT id FROM doctors ORDER BY id")]
+
+    @staticmethod
+    def _slot_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "startTime": row["start_time"],
+            "endTime": row["end_time"],
+            "isAvailable": bool(row["is_available"]),
+            "version": row["version"],
+        }
+
+    def find_time_slot(self, doctor_id: str, date: str, slot_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, start_time, end_time, is_available, version FROM time_slots "
+                "WHERE id = ? AND doctor_id = ? AND date = ?",
+                (slot_id, doctor_id, date),
+            ).fetchone()
+        return self._slot_from_row(row) if row is not None else None
+
+    def _set_slot_available(self, slot_id: str, available: bool) -> None:
+        self._conn.execute(
+            "UPDATE time_slots SET is_available = ?, version = version + 1 WHERE id = ?",
+            (int(available), slot_id),
+        )
+
+    def set_slot_available(self, slot_id: str, available: bool) -> None:
+        with self._lock:
+            self._set_slot_available(slot_id, available)
+
+    def _claim_slot(self, slot_id: str, version: int) -> bool:
+        # The WHERE clause is the compare-and-set: it matches nothing if anyone changed the slot since it was read
+        cursor = self._conn.execute(
+            "UPDATE time_slots SET is_available = 0, version = version + 1 "
+            "WHERE id = ? AND version = ? AND is_available = 1",
+            (slot_id, version),
+        )
+        return cursor.rowcount == 1
+
+    def claim_slot(self, slot_id: str, version: int) -> bool:
+        with self._lock:
+            return self._claim_slot(slot_id, version)
+
+    def get_availability(self, doctor_id, start_date=None, end_date=None, only_free=False, limit=None):
+        where = "doctor_id = ?"
+        params: List[Any] = [doctor_id]
+        if start_date is not None:
+            where += " AND date >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            where += " AND date <= ?"
+            params.append(end_date)
+        if only_free:
+            where += " AND is_available = 1"
+        sql = f"SELECT id, date, start_time, end_time, is_available, version FROM time_slots WHERE {where}"
+        if limit is not None:
+            # The first `limit` dates, found on idx_time_slots_doctor_date before any slot is read
+            sql += f" AND date IN (SELECT DISTINCT date FROM time_slots WHERE {where} ORDER BY date LIMIT ?)"
+            params += [*params, limit]
+        sql += " ORDER BY date, start_time"
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        days: List[Dict[str, Any]] = []
+        for row in rows:
+            if not days or days[-1]["date"] != row["date"]:
+                days.append({"date": row["date"], "timeSlots": []})
+            days[-1]["timeSlots"].append(self._slot_from_row(row))
+        return days
+
+    def earliest_free_slots(self, specialty, start, end, limit, doctor_ids=None):
+        # Walks idx_time_slots_free in time order; a doctor filter is applied while walking
+        # rather than as an IN list, which could exceed SQLite's parameter limit
+        start_date, start_time = start.date().isoformat(), start.strftime("%H:%M")
+        sql = (
+            "SELECT ts.id, ts.doctor_id, ts.date, ts.start_time, ts.end_time, ts.is_available, ts.version "
+            "FROM time_slots ts JOIN doctors d ON d.id = ts.doctor_id "
+            "WHERE ts.is_available = 1 AND (ts.date > ? OR (ts.date = ? AND ts.start_time >= ?))"
+        )
+        params: List[Any] = [start_date, start_date, start_time]
+        if end is not None:
+            end_date, end_time = end.date().isoformat(), end.strftime("%H:%M")
+            sql += " AND (ts.date < ? OR (ts.date = ? AND ts.start_time < ?))"
+            params += [end_date, end_date, end_time]
+        if specialty:
+            sql += " AND d.specialty = ?"
+            params.append(specialty)
+        sql += " ORDER BY ts.date, ts.start_time, ts.doctor_id"
+        allowed = set(doctor_ids) if doctor_ids is not None else None
+        if allowed is not None and not allowed:
+            return []
+        if allowed is None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        found = []
+        with self._lock:
+            for row in self._conn.execute(sql, params):
+                if len(found) == limit:
+                    break
+                if allowed is None or row["doctor_id"] in allowed:
+                    found.append({"doctorId": row["doctor_id"], "date": row["date"], "timeSlot": self._slot_from_row(row)})
+        return found
+
+    def roll_availability(self, doctor_ids, first_date, last_date):
+        if not doctor_ids:
+            return 0, 0
+        placeholders = ", ".join("?" * len(doctor_ids))
+        last = date.fromisoformat(last_date)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Each doctor's latest day is the template for the days added after it
+                templates: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {}
+                for row in self._conn.execute(
+                    "SELECT ts.doctor_id, ts.date, ts.start_time, ts.end_time FROM time_slots ts JOIN ("
+                    f"  SELECT doctor_id, MAX(date) AS date FROM time_slots WHERE doctor_id IN ({placeholders})"
+                    "   GROUP BY doctor_id"
+                    ") latest ON latest.doctor_id = ts.doctor_id AND latest.date = ts.date "
+                    "ORDER BY ts.doctor_id, ts.start_time",
+                    doctor_ids,
+                ):
+                    templates.setdefault(row["doctor_id"], (row["date"], []))[1].append((row["start_time"], row["end_time"]))
+
+                new_slots = []
+                for doctor_id, (latest, times) in templates.items():
+                    day = max(date.fromisoformat(latest) + timedelta(days=1), date.fromisoformat(first_date))
+                    while day <= last:
+                        new_slots += [
+                            (make_slot_id(doctor_id, day.isoformat(), time_to_minutes(start_time)), doctor_id,
+                             day.isoformat(), start_time, end_time)
+                            for start_time, end_time in times
+                        ]
+                        day += timedelta(days=1)
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO time_slots (id, doctor_id, date, start_time, end_time, is_available, version) "
+                    "VALUES (?, ?, ?, ?, ?, 1, 0)",
+                    new_slots,
+                )
+                removed = self._conn.execute(
+                    f"DELETE FROM time_slots WHERE doctor_id IN ({placeholders}) AND date < ?",
+                    [*doctor_ids, first_date],
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(new_slots), removed
+
+    @staticmethod
+    def _appointment_from_row(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "doctorId": row["doctor_id"],
+            "userId": row["user_id"],
+            "date": row["date"],
+            "timeSlotId": row["time_slot_id"],
+            "startTime": row["start_time"],
+            "endTime": row["end_time"],
+            "status": row["status"],
+            "symptoms": row["symptoms"],
+            "notes": row["notes"],
+            "createdAt": row["created_at"],
+            "updatedAt": row["updated_at"],
+        }
+
+    def get_appointment(self, appointment_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE id = ?", (appointment_id,)
+            ).fetchone()
+        return self._appointment_from_row(row) if row is not None else None
+
+    def _write_appointment(self, appointment: Dict[str, Any]) -> None:
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO appointments ({self.APPOINTMENT_COLUMNS}) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                appointment["id"], appointment["doctorId"], appointment["userId"], appointment["date"],
+                appointment.get("timeSlotId"), appointment["startTime"], appointment["endTime"],
+                appointment["status"], appointment.get("symptoms"), appointment.get("notes"),
+                appointment["createdAt"], appointment["updatedAt"],
+            ),
+        )
+
+    def save_appointment(self, appointment: Dict[str, Any]) -> None:
+        with self._lock:
+            self._write_appointment(appointment)
+
+    def book_appointment(self, appointment, slot_version, idempotency_key=None, request_hash=None):
+        # BEGIN IMMEDIATE takes the write lock up front, so the key check, the slot claim
+        # and the insert happen as one unit even across worker processes
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if idempotency_key is not None:
+                    seen = self._conn.execute(
+                        "SELECT request_hash, appointment_id, created_at FROM idempotency_keys "
+                        "WHERE user_id = ? AND key = ?",
+                        (appointment["userId"], idempotency_key),
+                    ).fetchone()
+                    if seen is not None and time.time() - seen["created_at"] < IDEMPOTENCY_KEY_TTL_SECONDS:
+                        if seen["request_hash"] != request_hash:
+                            raise IdempotencyKeyReuseError(idempotency_key)
+                        row = self._conn.execute(
+                            f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE id = ?",
+                            (seen["appointment_id"],),
+                        ).fetchone()
+                        self._conn.execute("COMMIT")
+                        return self._appointment_from_row(row), False
+
+                if not self._claim_slot(appointment["timeSlotId"], slot_version):
+                    raise SlotConflictError(appointment["timeSlotId"])
+
+                self._write_appointment(appointment)
+                if idempotency_key is not None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys (user_id, key, request_hash, appointment_id, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (appointment["userId"], idempotency_key, request_hash, appointment["id"], time.time()),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(appointment), True
+
+    def update_appointment(self, appointment_id, updated_at, notes=None, time_slot=None, date=None):
+        # One BEGIN IMMEDIATE transaction, so a cancel or another move from any worker
+        # cannot land between reading the appointment and freeing its old slot
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE id = ?", (appointment_id,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                appointment = self._appointment_from_row(row)
+                if notes is not None:
+                    appointment["notes"] = notes
+                if time_slot is not None:
+                    if appointment["status"] == "cancelled":
+                        raise AppointmentCancelledError(appointment_id)
+                    if not self._claim_slot(time_slot["id"], time_slot["version"]):
+                        raise SlotConflictError(time_slot["id"])
+                    if appointment["timeSlotId"]:
+                        self._set_slot_available(appointment["timeSlotId"], True)
+                    appointment.update(date=date, timeSlotId=time_slot["id"], startTime=time_slot["startTime"],
+                                       endTime=time_slot["endTime"])
+                appointment["updatedAt"] = updated_at
+                self._write_appointment(appointment)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return appointment
+
+    def cancel_appointment(self, appointment_id, updated_at):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Compare-and-set on the status: only the request that actually cancels frees the slot
+                cancelled = self._conn.execute(
+                    "UPDATE appointments SET status = 'cancelled', updated_at = ? WHERE id = ? AND status = 'scheduled'",
+                    (updated_at, appointment_id),
+                ).rowcount == 1
+                row = self._conn.execute(
+                    f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE id = ?", (appointment_id,)
+                ).fetchone()
+                if cancelled and row["time_slot_id"]:
+                    self._set_slot_available(row["time_slot_id"], True)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return self._appointment_from_row(row) if row is not None else None
+
+    def list_user_appointments(self, user_id, status=None, start_date=None, end_date=None, after=None, limit=None):
+        sql = f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if status is not None:
+            sql += " AND status = ?"
+            params.append(status)
+        if start_date is not None:
+            sql += " AND date >= ?"
+            params.append(start_date)
+        if end_date is not None:
+            sql += " AND date <= ?"
+            params.append(end_date)
+        if after is not None:
+            sql += " AND (date, start_time, id) > (?, ?, ?)"
+            params += list(after)
+        sql += " ORDER BY date, start_time, id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._appointment_from_row(row) for row in rows]
+
+    def list_doctor_appointments(self, doctor_id, date):
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {self.APPOINTMENT_COLUMNS} FROM appointments WHERE doctor_id = ? AND date = ? "
+                "ORDER BY start_time, id",
+                (doctor_id, date),
+            ).fetchall()
+        return [self._appointment_from_row(row) for row in rows]
+
+    def compact_appointments(self, cancelled_before, keys_created_before):
+        stale = "SELECT id FROM appointments WHERE status = 'cancelled' AND updated_at < ?"
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Keys first: they reference the appointments
+                keys = self._conn.execute(
+                    f"DELETE FROM idempotency_keys WHERE created_at < ? OR appointment_id IN ({stale})",
+                    (keys_created_before, cancelled_before),
+                ).rowcount
+                appointments = self._conn.execute(
+                    "DELETE FROM appointments WHERE status = 'cancelled' AND updated_at < ?", (cancelled_before,)
+                ).rowcount
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return appointments, keys
+
+def create_storage(path: Optional[str] = APPOINTMENT_DB) -> StorageBackend:
+    """SQLite storage when a path is configured, otherwise the in-memory backend"""
+    if path:
+        return SQLiteStorage(path)
+    return InMemoryStorage()
@@ -0,0 +1,107 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from appointment_storage import IDEMPOTENCY_KEY_TTL_SECONDS, StorageBackend
+
+# Days of bookable availability kept ahead, today included
+AVAILABILITY_WINDOW_DAYS = int(os.getenv("AVAILABILITY_WINDOW_DAYS", "7"))
+# Seconds between maintenance passes
+AVAILABILITY_MAINTENANCE_INTERVAL_SECONDS = float(os.getenv("AVAILABILITY_MAINTENANCE_INTERVAL_SECONDS", "600"))
+# How long a cancelled appointment is kept before it is deleted
+CANCELLED_APPOINTMENT_RETENTION_DAYS = float(os.getenv("CANCELLED_APPOINTMENT_RETENTION_DAYS", "7"))
+# Doctors handled per step; request handling gets the event loop back between steps
+AVAILABILITY_MAINTENANCE_BATCH = int(os.getenv("AVAILABILITY_MAINTENANCE_BATCH", "200"))
+
+logger = logging.getLogger("availability_maintenance")
+
+class AvailabilityMaintainer:
+    """
+    Background job that keeps the appointment store current.
+
+    Each pass rolls every doctor's availability window forward to today +
+    AVAILABILITY_WINDOW_DAYS, drops days before today, deletes appointments
+    cancelled more than CANCELLED_APPOINTMENT_RETENTION_DAYS ago and expired
+    idempotency keys. Doctors are handled in batches on a worker thread, so
+    a pass never holds the event loop or the storage lock for long.
+    """
+
+    def __init__(self, window_days: int = AVAILABILITY_WINDOW_DAYS,
+                 interval_seconds: float = AVAILABILITY_MAINTENANCE_INTERVAL_SECONDS,
+                 retention_days: float = CANCELLED_APPOINTMENT_RETENTION_DAYS,
+                 batch_size: int = AVAILABILITY_MAINTENANCE_BATCH):
+        self.window_days = window_days
+        self.interval_seconds = interval_seconds
+        self.retention_days = retention_days
+        self.batch_size = batch_size
+        self.runs = 0
+        self.failures = 0
+        self.last_run_at: Optional[str] = None
+        self.last_duration_ms: Optional[float] = None
+        self.total_duration_ms = 0.0
+        self.last_error: Optional[str] = None
+        self.reclaimed = {"slots_added": 0, "slots_removed": 0, "appointments_removed": 0, "idempotency_keys_removed": 0}
+        self.last_reclaimed = dict.fromkeys(self.reclaimed, 0)
+
+    async def run_once(self, storage: StorageBackend, today: Optional[date] = None) -> Dict[str, int]:
+        """One maintenance pass; returns what it added and removed"""
+        started = time.perf_counter()
+        self.last_run_at = datetime.now().isoformat()
+        today = today or date.today()
+        first_date = today.isoformat()
+        last_date = (today + timedelta(days=self.window_days - 1)).isoformat()
+        counts = dict.fromkeys(self.reclaimed, 0)
+
+        doctor_ids = await asyncio.to_thread(storage.doctor_ids)
+        for i in range(0, len(doctor_ids), self.batch_size):
+            added, removed = await asyncio.to_thread(
+                storage.roll_availability, doctor_ids[i:i + self.batch_size], first_date, last_date
+            )
+            counts["slots_added"] += added
+            counts["slots_removed"] += removed
+
+        cancelled_before = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+        appointments, keys = await asyncio.to_thread(
+            storage.compact_appointments, cancelled_before, time.time() - IDEMPOTENCY_KEY_TTL_SECONDS
+        )
+        counts["appointments_removed"] = appointments
+        counts["idempotency_keys_removed"] = keys
+
+        self.runs += 1
+        self.last_duration_ms = (time.perf_counter() - started) * 1000
+        self.total_duration_ms += self.last_duration_ms
+        self.last_reclaimed = counts
+        for name, count in counts.items():
+            self.reclaimed[name] += count
+        return counts
+
+    async def run_forever(self, get_storage: Callable[[], StorageBackend]) -> None:
+        """Run a pass now and then every interval_seconds until cancelled"""
+        while True:
+            try:
+                await self.run_once(get_storage())
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                logger.exception("Availability maintenance pass failed")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "window_days": self.window_days,
+            "interval_seconds": self.interval_seconds,
+            "runs": self.runs,
+            "failures": self.failures,
+            "last_run_at": self.last_run_at,
+            "last_duration_ms": round(self.last_duration_ms, 2) if self.last_duration_ms is not None else None,
+            "avg_duration_ms": round(self.total_duration_ms / self.runs, 2) if self.runs else 0.0,
+            "last_error": self.last_error,
+            "last_pass": dict(self.last_reclaimed),
+            "total": dict(self.reclaimed),
+        }
+
+# Shared by the Doctor Appointment API
+availability_maintainer = AvailabilityMaintainer()
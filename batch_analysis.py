@@ -0,0 +1,214 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Optional
+
+# Limits for batch analysis (per batch)
+BATCH_DEFAULT_CONCURRENCY = int(os.getenv("BATCH_DEFAULT_CONCURRENCY", "8"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "32"))
+BATCH_MAX_ATTEMPTS = int(os.getenv("BATCH_MAX_ATTEMPTS", "5"))
+BATCH_RETRY_BASE_SECONDS = float(os.getenv("BATCH_RETRY_BASE_SECONDS", "1"))
+BATCH_RETRY_MAX_SECONDS = float(os.getenv("BATCH_RETRY_MAX_SECONDS", "60"))
+
+# Records read ahead of the oldest unfinished one, per unit of concurrency
+READ_AHEAD_FACTOR = 4
+
+# google.api_core errors carry the HTTP status as .code; these are worth retrying
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+RATE_LIMITED_STATUS_CODE = 429
+
+# Where the text to analyze is looked for in a record (requests.jsonl uses "body")
+TEXT_FIELDS = ("text", "body", "message")
+ID_FIELDS = ("id", "request_id")
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    return getattr(error, "code", None) in RETRYABLE_STATUS_CODES
+
+def record_text(record: Dict[str, Any], text_field: Optional[str] = None) -> Optional[str]:
+    fields = (text_field,) if text_field else TEXT_FIELDS
+    for field in fields:
+        value = record.get(field)
+        if isinstance(value, str) and value.strip():
+            return value
+    return None
+
+def record_id(record: Dict[str, Any], index: int) -> Any:
+    for field in ID_FIELDS:
+        if field in record:
+            return record[field]
+    return index
+
+class RateLimitGate:
+    """Shared pause: once any call is rate limited, every worker waits before its next call"""
+
+    def __init__(self):
+        self.resume_at = 0.0
+        self.pauses = 0
+
+    def pause(self, seconds: float) -> None:
+        self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+        self.pauses += 1
+
+    async def wait(self) -> None:
+        delay = self.resume_at - time.monotonic()
+        while delay > 0:
+            await asyncio.sleep(delay)
+            delay = self.resume_at - time.monotonic()
+
+async def analyze_with_retry(analyze: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                             text: str, record: Dict[str, Any], gate: RateLimitGate,
+                             retryable: Callable[[Exception], bool], max_attempts: int,
+                             result: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one analysis, retrying transient failures with exponential backoff and full jitter"""
+    for attempt in range(1, max_attempts + 1):
+        await gate.wait()
+        result["attempts"] = attempt
+        try:
+            return await analyze(text, record)
+        except Exception as e:
+            if attempt == max_attempts or not retryable(e):
+                raise
+            delay = min(BATCH_RETRY_MAX_SECONDS, BATCH_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+            if getattr(e, "code", None) == RATE_LIMITED_STATUS_CODE:
+                # Slow the whole batch down, not just this record
+                gate.pause(delay)
+            await asyncio.sleep(random.uniform(0, delay))
+
+async def run_batch(lines: Iterable[str], analyze: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+                    concurrency: int = BATCH_DEFAULT_CONCURRENCY, start: int = 0,
+                    max_attempts: int = BATCH_MAX_ATTEMPTS, retryable: Callable[[Exception], bool] = is_retryable,
+                    text_field: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Analyze JSONL records with at most `concurrency` in flight and yield one
+    result per record in input order, as soon as each is ready.
+
+    Blank lines are ignored; the first `start` records are skipped, which is
+    how an interrupted batch resumes. A record that still fails after its
+    retries gets a result with "error" set instead of stopping the batch.
+    """
+    workers = asyncio.Semaphore(max(1, concurrency))
+    read_ahead = asyncio.Semaphore(max(1, concurrency) * READ_AHEAD_FACTOR)
+    gate = RateLimitGate()
+    queue: "asyncio.Queue[Optional[asyncio.Task]]" = asyncio.Queue()
+
+    async def process(index: int, line: str) -> Dict[str, Any]:
+        result = {"index": index, "id": index, "extracted_symptoms": None, "diagnosis": None, "attempts": 0, "error": None}
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("record is not a JSON object")
+        except ValueError as e:
+            result["error"] = f"Invalid record: {str(e)}"
+            return result
+
+        result["id"] = record_id(record, index)
+        text = record_text(record, text_field)
+        if text is None:
+            result["error"] = "Record has no text to analyze"
+            return result
+
+        async with workers:
+            try:
+                result.update(await analyze_with_retry(analyze, text, record, gate, retryable, max_attempts, result))
+            except Exception as e:
+                result["error"] = f"Error analyzing symptoms: {str(e)}"
+        return result
+
+    async def produce() -> None:
+        try:
+            index = 0
+            for line in lines:
+                if not line.strip():
+                    continue
+                if index >= start:
+                    await read_ahead.acquire()
+                    queue.put_nowait(asyncio.ensure_future(process(index, line)))
+                index += 1
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.ensure_future(produce())
+    try:
+        while True:
+            task = await queue.get()
+            if task is None:
+                break
+            result = await task
+            read_ahead.release()
+            yield result
+        await producer
+    finally:
+        # Consumer stopped early (client went away): don't leave work running
+        producer.cancel()
+        while not queue.empty():
+            task = queue.get_nowait()
+            if task is not None:
+                task.cancel()
+
+def completed_results(path: str) -> int:
+    """Number of complete result lines in an output file, dropping a partly written last line"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end != len(data):
+            f.truncate(end)
+    return data[:end].count(b"\n")
+
+def main():
+    """Analyze a JSONL file of symptom descriptions, writing ordered JSONL results; rerun to resume"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("input", help="JSONL file, one record per line (text in 'text', 'body' or 'message')")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results file; also the checkpoint")
+    parser.add_argument("--concurrency", type=int, default=BATCH_DEFAULT_CONCURRENCY, help="Records analyzed at once")
+    parser.add_argument("--max-attempts", type=int, default=BATCH_MAX_ATTEMPTS, help="Tries per record")
+    parser.add_argument("--text-field", default=None, help="Field holding the text, if not one of the defaults")
+    parser.add_argument("--api-key", default=os.getenv("GEMINI_API_KEY"), help="Gemini API key (default $GEMINI_API_KEY)")
+    parser.add_argument("--restart", action="store_true", help="Ignore existing results and start from the top")
+    args = parser.parse_args()
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or GEMINI_API_KEY)")
+
+    # Imported here so --help works without the service's dependencies
+    import feature1_fastapi
+
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+    start = completed_results(args.output)
+    if start:
+        print(f"Resuming after {start} completed records")
+
+    async def run():
+        # Created on the running loop: the model's async client binds to the loop it is created on
+        model = feature1_fastapi.initialize_genai(args.api_key)
+
+        async def analyze(text, record):
+            return await feature1_fastapi.analyze_text(text, model)
+
+        done = failed = 0
+        began = time.perf_counter()
+        with open(args.input, encoding="utf-8") as source, open(args.output, "a", encoding="utf-8") as out:
+            async for result in run_batch(source, analyze, args.concurrency, start, args.max_attempts,
+                                          feature1_fastapi.is_retryable_error, args.text_field):
+                out.write(json.dumps(result) + "\n")
+                out.flush()
+                done += 1
+                failed += result["error"] is not None
+                if done % 50 == 0:
+                    print(f"{done} records, {done / (time.perf_counter() - began):.1f}/s")
+        elapsed = time.perf_counter() - began
+        print(f"Done: {done} records ({failed} failed) in {elapsed:.1f}s, {done / elapsed if elapsed else 0:.1f}/s")
+        return 1 if failed else 0
+
+    return asyncio.run(run())
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+
+import feature1_fastapi
+from response_cache import ResponseCache
+
+SAMPLE_TEXTS = [
+    "I have had a fever and sore throat since yesterday",
+    "Sharp pain in my lower back when I bend, and my left leg feels numb",
+    "Headache every morning, blurry vision and I feel dizzy when standing up",
+    "Persistent dry cough for two weeks, mild chest tightness at night",
+]
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Stand-in for a Gemini model: fixed latency per call, JSON answers in JSON mode"""
+    def __init__(self, latency: float, invalid_rate: float):
+        self.latency = latency
+        self.invalid_rate = invalid_rate
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        if generation_config is None:
+            return StubResponse("- Fever\n- Sore throat")
+        if random.random() < self.invalid_rate:
+            return StubResponse('{"extracted_symptoms": "- Fever"')  # truncated JSON
+        return StubResponse(json.dumps({"extracted_symptoms": "- Fever\n- Sore throat", "diagnosis": "Common cold"}))
+
+async def run_mode(model, single_call: bool, rounds: int):
+    """Latency in ms of each analysis, run one at a time"""
+    timings = []
+    for i in range(rounds):
+        text = SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)]
+        start = time.perf_counter()
+        await feature1_fastapi.analyze_text(text, model, single_call=single_call)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def main():
+    """Compare /analyze latency and model calls: two sequential calls vs. one JSON-mode call"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--rounds", type=int, default=20, help="Analyses per mode")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per model call (seconds)")
+    parser.add_argument("--invalid-rate", type=float, default=0.0, help="Share of stub JSON answers that fail to parse")
+    parser.add_argument("--api-key", default=None, help="Benchmark the real Gemini model instead of the stub")
+    args = parser.parse_args()
+
+    # Every analysis must reach the model, so run without the response cache or the local prefilter
+    feature1_fastapi.analysis_cache = ResponseCache(max_entries=0, db_path=None)
+    feature1_fastapi.symptom_prefilter.enabled = False
+
+    print("=" * 64)
+    print(f"{'mode':<12} {'calls/req':>9} {'mean (ms)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9} {'fallbacks':>9}")
+    print("=" * 64)
+    results = {}
+    for label, single_call in (("two-call", False), ("single-call", True)):
+        if args.api_key:
+            model = feature1_fastapi.initialize_genai(args.api_key)
+        else:
+            model = StubModel(args.latency, args.invalid_rate)
+        feature1_fastapi.single_call_stats.update(calls=0, fallbacks=0)
+        timings = sorted(asyncio.run(run_mode(model, single_call, args.rounds)))
+        # The real model does not count its calls
+        calls = f"{model.calls / args.rounds:.2f}" if isinstance(model, StubModel) else "-"
+        p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+        results[label] = statistics.mean(timings)
+        print(f"{label:<12} {calls:>9} {results[label]:>10.1f} {statistics.median(timings):>9.1f} {p99:>9.1f} "
+              f"{feature1_fastapi.single_call_stats['fallbacks']:>9}")
+
+    print("-" * 64)
+    print(f"Single-call mode takes {results['single-call'] / results['two-call']:.0%} of the two-call time")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
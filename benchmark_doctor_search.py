@@ -0,0 +1,107 @@
+import argparse
+import random
+import sys
+import time
+
+from geopy.distance import geodesic
+
+import doctor_appointment_api
+from appointment_storage import InMemoryStorage
+from doctor_appointment_api import find_nearby_doctors
+
+# Search centre and the area the synthetic doctors are spread over (roughly the Bay Area and beyond)
+CENTER = (37.7749, -122.4194)
+SPREAD_DEGREES = 2.0
+
+def make_doctors(count: int, specialties):
+    """Generate lightweight doctor records spread uniformly around CENTER"""
+    rng = random.Random(42)
+    for i in range(count):
+        yield {
+            "id": f"bench-{i}",
+            "specialty": specialties[i % len(specialties)],
+            "location": {
+                "lat": CENTER[0] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES),
+                "lng": CENTER[1] + rng.uniform(-SPREAD_DEGREES, SPREAD_DEGREES)
+            }
+        }
+
+def loop_search(doctors, lat, lng, radius, specialty, limit, offset):
+    """The previous implementation: a geodesic per doctor, a copy per match, then a full sort"""
+    filtered_doctors = []
+    for doctor in doctors.values():
+        if specialty and doctor["specialty"] != specialty:
+            continue
+        distance = geodesic((lat, lng), (doctor["location"]["lat"], doctor["location"]["lng"])).kilometers
+        if distance <= radius:
+            doctor_copy = doctor.copy()
+            doctor_copy["distance"] = round(distance, 2)
+            filtered_doctors.append(doctor_copy)
+    filtered_doctors.sort(key=lambda x: x["distance"])
+    return filtered_doctors[offset:offset + limit], len(filtered_doctors)
+
+def time_call(func, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    """Benchmark doctor search: the old per-doctor loop vs. the indexed, vectorized search"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--sizes", default="1000,100000,1000000", help="Comma-separated doctor counts")
+    parser.add_argument("--radius", type=float, default=10.0, help="Search radius in km")
+    parser.add_argument("--specialty", default=None, help="Restrict to one specialty")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--offset", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    parser.add_argument("--loop-max", type=int, default=100000,
+                        help="Above this size the loop is timed on a sample and extrapolated")
+    args = parser.parse_args()
+
+    lat, lng = CENTER
+    print("=" * 72)
+    print(f"Doctor search benchmark: radius {args.radius} km, specialty {args.specialty or 'any'}, "
+          f"limit {args.limit}, offset {args.offset}")
+    print("=" * 72)
+    print(f"{'doctors':>10} {'matches':>8} {'loop (s)':>12} {'indexed (s)':>12} {'speedup':>9}")
+
+    for size in (int(s) for s in args.sizes.split(",")):
+        db = InMemoryStorage(seed=False)
+        for doctor in make_doctors(size, db.specialties):
+            db.add_doctor(doctor)
+        doctor_appointment_api.db = db
+
+        indexed_time, (page, total) = time_call(
+            lambda: find_nearby_doctors(lat, lng, args.radius, args.specialty, args.limit, args.offset),
+            args.repeat
+        )
+
+        if size <= args.loop_max:
+            loop_time, (loop_page, loop_total) = time_call(
+                lambda: loop_search(db.doctors, lat, lng, args.radius, args.specialty, args.limit, args.offset),
+                1
+            )
+            if loop_total != total:
+                print(f"❌ Result mismatch at {size}: loop found {loop_total}, index found {total}")
+            loop_label = f"{loop_time:12.4f}"
+        else:
+            sample = dict(list(db.doctors.items())[:args.loop_max])
+            sample_time, _ = time_call(
+                lambda: loop_search(sample, lat, lng, args.radius, args.specialty, args.limit, args.offset),
+                1
+            )
+            loop_time = sample_time * size / args.loop_max
+            loop_label = f"~{loop_time:11.4f}"
+
+        print(f"{size:>10} {total:>8} {loop_label} {indexed_time:12.4f} {loop_time / indexed_time:8.0f}x")
+
+    print("-" * 72)
+    print("~ = loop time extrapolated linearly from a sample of --loop-max doctors")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from datetime import date, timedelta
+
+from appointment_storage import InMemoryStorage
+from slot_grid import SLOT_MINUTES, minutes_to_time
+
+def make_doctors(count: int, days: int, specialties):
+    """Doctors with SLOT_MINUTES slots from 9 to 5 over `days` days, in the API's nested shape"""
+    first = date(2030, 1, 1)
+    for i in range(count):
+        availability = []
+        for day in range(days):
+            availability.append({
+                "date": (first + timedelta(days=day)).isoformat(),
+                "timeSlots": [
+                    {"id": str(uuid.uuid4()), "startTime": minutes_to_time(start),
+                     "endTime": minutes_to_time(start + SLOT_MINUTES), "isAvailable": True}
+                    for start in range(9 * 60, 17 * 60, SLOT_MINUTES)
+                ],
+            })
+        yield {
+            "id": f"bench-{i}",
+            "specialty": specialties[i % len(specialties)],
+            "location": {"lat": 37.7749, "lng": -122.4194},
+            "availability": availability,
+        }
+
+class DictSlotStore:
+    """The previous in-memory layout: a dict per slot, indexed by slot id and by (doctor, date)"""
+
+    def __init__(self):
+        self.doctors = {}
+        self.time_slots = {}
+        self.doctor_days = {}
+
+    def add_doctor(self, doctor):
+        self.doctors[doctor["id"]] = doctor
+        for day in doctor["availability"]:
+            self.doctor_days[(doctor["id"], day["date"])] = day
+            for slot in day["timeSlots"]:
+                slot.setdefault("version", 0)
+                self.time_slots[slot["id"]] = (doctor["id"], day["date"], slot)
+
+    def get_availability(self, doctor_id, start_date=None, end_date=None):
+        return [
+            avail for avail in self.doctors[doctor_id]["availability"]
+            if (start_date is None or start_date <= avail["date"])
+            and (end_date is None or avail["date"] <= end_date)
+        ]
+
+def measure_memory(build):
+    """(store, bytes allocated while building it)"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    store = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return store, after - before
+
+def time_queries(store, doctor_ids, window, days, repeat):
+    """Mean seconds per availability response (query + JSON encoding) over a random `window`-day range"""
+    rng = random.Random(7)
+    first = date(2030, 1, 1)
+    queries = []
+    for _ in range(repeat):
+        offset = rng.randrange(max(1, days - window + 1))
+        queries.append((rng.choice(doctor_ids), (first + timedelta(days=offset)).isoformat(),
+                        (first + timedelta(days=offset + window - 1)).isoformat()))
+    start = time.perf_counter()
+    for doctor_id, start_date, end_date in queries:
+        json.dumps(store.get_availability(doctor_id, start_date, end_date))
+    return (time.perf_counter() - start) / repeat
+
+def main():
+    """Compare slot storage: a dict per slot (previous layout) vs. the compact per-doctor slot grid"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--doctors", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=90, help="Days of availability per doctor")
+    parser.add_argument("--window", type=int, default=7, help="Days per availability query")
+    parser.add_argument("--queries", type=int, default=2000)
+    args = parser.parse_args()
+
+    specialties = InMemoryStorage.specialties
+    doctors = list(make_doctors(args.doctors, args.days, specialties))
+    slots = sum(len(day["timeSlots"]) for doctor in doctors for day in doctor["availability"])
+    doctor_ids = [doctor["id"] for doctor in doctors]
+
+    def build_dicts():
+        store = DictSlotStore()
+        # Fresh copies: the dict layout keeps the nested records themselves
+        for doctor in make_doctors(args.doctors, args.days, specialties):
+            store.add_doctor(doctor)
+        return store
+
+    def build_grid():
+        store = InMemoryStorage(seed=False)
+        for doctor in doctors:
+            store.add_doctor(doctor)
+        return store
+
+    print("=" * 64)
+    print(f"Slot storage: {args.doctors} doctors x {args.days} days = {slots} slots of {SLOT_MINUTES} min")
+    print("=" * 64)
+    print(f"{'layout':>8} {'memory (MB)':>12} {'bytes/slot':>11} {f'{args.window}-day response (us)':>23}")
+
+    results = {}
+    for label, build in (("dicts", build_dicts), ("grid", build_grid)):
+        store, allocated = measure_memory(build)
+        query = time_queries(store, doctor_ids, args.window, args.days, args.queries)
+        results[label] = (allocated, query)
+        print(f"{label:>8} {allocated / 1e6:12.1f} {allocated / slots:11.1f} {query * 1e6:23.1f}")
+        del store
+
+    print("-" * 64)
+    print(f"Memory: {results['dicts'][0] / results['grid'][0]:.1f}x smaller, "
+          f"availability responses: {results['dicts'][1] / results['grid'][1]:.1f}x faster")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
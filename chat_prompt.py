@@ -0,0 +1,205 @@
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from session_store import CHAT_SESSION_MAX_SESSIONS, session_store
+
+# Token budgets for Health Assistant prompts (estimated, see estimate_tokens)
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "2000"))
+CHAT_SUMMARY_TOKEN_BUDGET = int(os.getenv("CHAT_SUMMARY_TOKEN_BUDGET", "300"))
+
+# Longest summary line kept for one message that left the window
+SUMMARY_LINE_TOKENS = 40
+
+# The instructions every prompt starts with; built once, not per request
+HEALTH_ASSISTANT_PREAMBLE = """
+    You are an AI Health Assistant, a knowledgeable and helpful medical advisor. Your task is to analyze the provided symptoms, suggest possible conditions, and offer guidance while maintaining caution in diagnosis.
+
+Instructions:
+Extract key symptoms and analyze potential conditions.
+Provide confidence scores (%) for each possible disease.
+Use evidence-based medical knowledge to explain likely causes.
+Format key information using bold text for emphasis.
+Break responses into clear sections with spacing for readability.
+Offer guidance on possible causes, treatments, and diet.
+Avoid making definitive diagnoses and recommend professional consultation.
+"""
+
+SENTENCE_END = re.compile(r"(?<=[.!?])\s")
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: about four characters per token for English text"""
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text: str, tokens: int) -> str:
+    """Cut text to roughly `tokens` tokens, marking the cut"""
+    if estimate_tokens(text) <= tokens:
+        return text
+    return text[:max(0, tokens * 4 - 1)].rstrip() + "…"
+
+def role_label(message: Dict[str, Any]) -> str:
+    return "User" if message["role"] == "user" else "Assistant"
+
+def summary_line(message: Dict[str, Any]) -> str:
+    """One short line standing in for a message: its first sentence, capped at SUMMARY_LINE_TOKENS"""
+    first_sentence = SENTENCE_END.split(" ".join(message["content"].split()), maxsplit=1)[0]
+    return f"{role_label(message)}: {truncate_to_tokens(first_sentence, SUMMARY_LINE_TOKENS)}"
+
+class ChatPromptBuilder:
+    """
+    Builds Health Assistant prompts within a token budget.
+
+    The newest messages that fit the budget go in verbatim. Older ones are
+    folded into a rolling summary, one short line each, kept per session
+    so each message is summarized once; the oldest lines drop off when the
+    summary outgrows its own budget. Messages are recognized by the "seq"
+    number the session store gives them. Messages the session store drops
+    from a full session are summarized as they go (summarize_dropped), so
+    none leaves the conversation without a line in the summary. A summarized
+    message that is back in the window (a short turn leaves room for more
+    history) goes in verbatim only; its summary line is left out.
+    """
+
+    def __init__(self, context_budget: int = CHAT_CONTEXT_TOKEN_BUDGET,
+                 summary_budget: int = CHAT_SUMMARY_TOKEN_BUDGET,
+                 max_sessions: int = CHAT_SESSION_MAX_SESSIONS,
+                 preamble: str = HEALTH_ASSISTANT_PREAMBLE):
+        self.context_budget = context_budget
+        self.summary_budget = summary_budget
+        self.max_sessions = max_sessions
+        self.preamble = preamble
+        self.preamble_tokens = estimate_tokens(preamble)
+        # session id -> {"through_seq": int, "lines": deque of (seq, line), "tokens": int}, least recently used first
+        self._summaries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.prompt_tokens = 0
+        self.summarized_messages = 0
+        self.truncated_messages = 0
+
+    def forget(self, session_id: str) -> None:
+        """Drop a session's summary, e.g. after its history was reset"""
+        with self._lock:
+            self._summaries.pop(session_id, None)
+
+    def summarize_dropped(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        """Fold messages the session store dropped into the session's summary"""
+        with self._lock:
+            self._summarize(session_id, messages)
+
+    def _summarize(self, session_id: Optional[str], older: List[Dict[str, Any]]) -> List[Tuple[Optional[int], str]]:
+        """Fold messages that left the window into the session's rolling summary and return its (seq, line)s"""
+        if session_id is None:
+            summary = {"through_seq": -1, "lines": deque(), "tokens": 0}
+        else:
+            summary = self._summaries.get(session_id)
+            if summary is None:
+                summary = self._summaries[session_id] = {"through_seq": -1, "lines": deque(), "tokens": 0}
+            self._summaries.move_to_end(session_id)
+            while len(self._summaries) > self.max_sessions:
+                self._summaries.popitem(last=False)
+
+        for message in older:
+            seq = message.get("seq")
+            if seq is not None and seq <= summary["through_seq"]:
+                continue
+            line = summary_line(message)
+            summary["lines"].append((seq, line))
+            summary["tokens"] += estimate_tokens(line)
+            if seq is not None:
+                summary["through_seq"] = seq
+            self.summarized_messages += 1
+        while summary["tokens"] > self.summary_budget and summary["lines"]:
+            summary["tokens"] -= estimate_tokens(summary["lines"].popleft()[1])
+        return list(summary["lines"])
+
+    def _fit(self, user_message: str, conversation_history: List[Dict[str, Any]], session_id: Optional[str]):
+        """(summary lines, [(message, text kept)] of the newest messages that fit), under self._lock"""
+        history = list(conversation_history)
+        # The history usually ends with the message being answered; it goes in once, at the end
+        if history and history[-1]["role"] == "user" and history[-1]["content"] == user_message:
+            history.pop()
+
+        remaining = self.context_budget - self.preamble_tokens - estimate_tokens(user_message) - self.summary_budget
+        window = []
+        start = len(history)
+        while start > 0 and remaining > 0:
+            message = history[start - 1]
+            text = message["content"]
+            tokens = estimate_tokens(text)
+            if tokens > remaining:
+                # A long reply must not crowd out everything else: keep its start only
+                if window:
+                    break
+                text = truncate_to_tokens(text, remaining)
+                self.truncated_messages += 1
+            window.append((message, text))
+            remaining -= estimate_tokens(text)
+            start -= 1
+        window.reverse()
+
+        lines = self._summarize(session_id, history[:start])
+        # Lines of messages that are in the window again would repeat them
+        first_seq = window[0][0].get("seq") if window else None
+        if first_seq is not None:
+            return [line for seq, line in lines if seq is None or seq < first_seq], window
+        return [line for _, line in lines], window
+
+    def build(self, user_message: str, conversation_history: List[Dict[str, Any]],
+              session_id: Optional[str] = None) -> str:
+        """The whole turn as one text prompt: preamble, summary, recent messages, new message"""
+        with self._lock:
+            summary, window = self._fit(user_message, conversation_history, session_id)
+
+            parts = [self.preamble]
+            if summary:
+                parts += ["", "    Summary of earlier conversation:", *summary]
+            parts += ["", "    Previous conversation:", *(f"{role_label(message)}: {text}" for message, text in window),
+                      "", f"    User: {user_message}", "    Assistant:", ""]
+            prompt = "\n".join(parts)
+
+            self.prompts += 1
+            self.prompt_tokens += estimate_tokens(prompt)
+            return prompt
+
+    def build_contents(self, user_message: str, conversation_history: List[Dict[str, Any]],
+                       session_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Chat history as structured contents for start_chat(), under the same
+        budget. The preamble is not included (it is the model's system
+        instruction) and neither is the new message (send it with send_message).
+        """
+        with self._lock:
+            summary, window = self._fit(user_message, conversation_history, session_id)
+
+            contents = []
+            if summary:
+                contents.append({"role": "user", "parts": ["Summary of earlier conversation:\n" + "\n".join(summary)]})
+            for message, text in window:
+                contents.append({"role": "user" if message["role"] == "user" else "model", "parts": [text]})
+
+            self.prompts += 1
+            self.prompt_tokens += self.preamble_tokens + estimate_tokens(user_message) + sum(
+                estimate_tokens(part) for content in contents for part in content["parts"]
+            )
+            return contents
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "context_token_budget": self.context_budget,
+                "summary_token_budget": self.summary_budget,
+                "summaries": len(self._summaries),
+                "prompts": self.prompts,
+                "avg_prompt_tokens": round(self.prompt_tokens / self.prompts, 1) if self.prompts else 0.0,
+                "summarized_messages": self.summarized_messages,
+                "truncated_messages": self.truncated_messages,
+            }
+
+# Shared prompt builder for the Health Assistant
+chat_prompt_builder = ChatPromptBuilder()
+# Summarize what the session store drops, and start over when a session is reset
+session_store.add_eviction_listener(chat_prompt_builder.summarize_dropped)
+session_store.add_reset_listener(chat_prompt_builder.forget)
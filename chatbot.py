@@ -1,12 +1,19 @@
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
-import google.generativeai as genai
+import asyncio
 import logging
+import os
 from typing import Dict, Any, List, Optional
 import json
 import uvicorn
+from contextlib import asynccontextmanager
+
+from chat_prompt import HEALTH_ASSISTANT_PREAMBLE, chat_prompt_builder
+from genai_clients import model_client_state, model_pool, start_warm_up
+from session_store import session_store
+from sse import SSE_HEADERS, format_sse_event
 
 # Configure logging
 logging.basicConfig(
@@ -15,8 +22,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger("health_assistant_api")
 
+# "prompt": the conversation goes out as one text prompt per turn.
+# "native": structured chat history via start_chat, with the preamble as the system instruction.
+CHAT_MODE = os.getenv("CHAT_MODE", "prompt")
+# In native mode, keep the preamble in the provider's context cache ("1" to enable)
+CHAT_CONTEXT_CACHE = os.getenv("CHAT_CONTEXT_CACHE", "0") == "1"
+
+# Warm the Gemini SDK in the background once the server is up
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    start_warm_up()
+    yield
+
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Health Assistant API",
     description="API for AI-powered health assistant using Gemini 2.5 Flash",
     version="1.0.0"
@@ -41,108 +61,103 @@ class ChatResponse(BaseModel):
     response: str
     session_id: str
 
-# Store conversation histories by session ID
-conversation_histories: Dict[str, List[Dict[str, Any]]] = {}
+MODEL_NAME = "gemini-2.0-flash-exp"
 
-# Function to initialize Gemini model
+# Function to get a Gemini model for this API key (cached per key)
 def initialize_genai(api_key: str):
-    genai.configure(api_key=api_key)
-    return genai.GenerativeModel(model_name="gemini-2.0-flash-exp")
+    return model_pool.get(api_key, MODEL_NAME)
 
-def format_prompt(user_message: str, conversation_history: List[Dict[str, Any]]) -> str:
+def format_prompt(user_message: str, conversation_history: List[Dict[str, Any]],
+                  session_id: Optional[str] = None) -> str:
     """
     Format the prompt for the Gemini model
-    
+
     Args:
         user_message: The user's message
         conversation_history: The conversation history
-        
+        session_id: Session the history belongs to, so its rolling summary can be reused
+
     Returns:
-        Formatted prompt string
-    """
-    # Create a context from conversation history (limited to last 5 messages)
-    context = ""
-    if conversation_history:
-        recent_history = conversation_history[-5:]
-        for msg in recent_history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            context += f"{role}: {msg['content']}\n"
-    
-    prompt = f"""
-    You are an AI Health Assistant, a knowledgeable and helpful medical advisor. Your task is to analyze the provided symptoms, suggest possible conditions, and offer guidance while maintaining caution in diagnosis.
-
-Instructions:
-Extract key symptoms and analyze potential conditions.
-Provide confidence scores (%) for each possible disease.
-Use evidence-based medical knowledge to explain likely causes.
-Format key information using bold text for emphasis.
-Break responses into clear sections with spacing for readability.
-Offer guidance on possible causes, treatments, and diet.
-Avoid making definitive diagnoses and recommend professional consultation.
-    
-    
-    Previous conversation:
-    {context}
-    
-    User: {user_message}
-    Assistant:
+        Formatted prompt string, within CHAT_CONTEXT_TOKEN_BUDGET
     """
-    
-    return prompt
+    return chat_prompt_builder.build(user_message, conversation_history, session_id)
+
+# Function to send one turn to Gemini, as a single text prompt or as a native chat
+async def send_turn(request: ChatRequest, session_id: str, conversation_history: List[Dict[str, Any]],
+                    stream: bool = False):
+    if CHAT_MODE == "native":
+        # Built on the event loop (its async client binds to it); only creating a context cache is threaded
+        model = await model_pool.get_async(request.api_key, MODEL_NAME, HEALTH_ASSISTANT_PREAMBLE, CHAT_CONTEXT_CACHE)
+        history = chat_prompt_builder.build_contents(request.message, conversation_history, session_id)
+        chat = model.start_chat(history=history)
+        return await chat.send_message_async(request.message, stream=stream)
+
+    model = initialize_genai(request.api_key)
+    prompt = format_prompt(request.message, conversation_history, session_id)
+    return await model.generate_content_async(prompt, stream=stream)
 
 @app.post("/chat", response_model=ChatResponse)
 async def chat_with_assistant(request: ChatRequest):
     try:
         # Generate a session ID if not provided
-        session_id = request.session_id or f"session_{len(conversation_histories) + 1}"
-        
-        # Get or create conversation history for this session
-        if session_id not in conversation_histories:
-            conversation_histories[session_id] = []
-        
-        conversation_history = conversation_histories[session_id]
-        
-        # Add user message to conversation history
-        conversation_history.append({
-            "role": "user",
-            "content": request.message
-        })
-        
-        # Initialize Gemini model with the provided API key
-        model = initialize_genai(request.api_key)
+        session_id = request.session_id or session_store.new_session_id()
         
-        # Generate the prompt
-        prompt = format_prompt(request.message, conversation_history)
+        # Add user message to conversation history (creates the session if needed)
+        conversation_history = session_store.append(session_id, "user", request.message)
         
         # Get response from Gemini
-        response = model.generate_content(prompt)
+        response = await send_turn(request, session_id, conversation_history)
         assistant_response = response.text
         
         # Add assistant response to conversation history
-        conversation_history.append({
-            "role": "assistant",
-            "content": assistant_response
-        })
+        session_store.append(session_id, "assistant", assistant_response)
         
         # Ensure we have a disclaimer if not already present
         if "disclaimer" not in assistant_response.lower() and "consult" not in assistant_response.lower():
             assistant_response += ""
         
-        # Update the conversation history
-        conversation_histories[session_id] = conversation_history
-        
         return ChatResponse(response=assistant_response, session_id=session_id)
     except Exception as e:
         logger.error(f"Error processing chat: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_with_assistant_stream(request: ChatRequest):
+    """Same as /chat, but the reply is streamed as Server-Sent Events while Gemini generates it"""
+    try:
+        session_id = request.session_id or session_store.new_session_id()
+        conversation_history = session_store.append(session_id, "user", request.message)
+    except Exception as e:
+        logger.error(f"Error processing chat: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
+
+    async def events():
+        yield format_sse_event("session", {"session_id": session_id})
+
+        parts = []
+        try:
+            response = await send_turn(request, session_id, conversation_history, stream=True)
+            async for chunk in response:
+                parts.append(chunk.text)
+                yield format_sse_event("message", {"text": chunk.text})
+        except Exception as e:
+            logger.error(f"Error streaming chat: {str(e)}")
+            yield format_sse_event("error", {"detail": f"Error processing chat: {str(e)}"})
+            return
+
+        # Only a completed reply goes into the history
+        assistant_response = "".join(parts)
+        session_store.append(session_id, "assistant", assistant_response)
+        yield format_sse_event("done", {"response": assistant_response, "session_id": session_id})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.post("/reset")
 async def reset_conversation(request: ChatRequest):
     try:
         session_id = request.session_id
         
-        if session_id and session_id in conversation_histories:
-            conversation_histories[session_id] = []
+        if session_id and session_store.reset(session_id):
             return JSONResponse(content={"message": "Conversation reset successfully", "session_id": session_id})
         else:
             return JSONResponse(content={"message": "Session not found", "session_id": session_id}, status_code=404)
@@ -154,6 +169,23 @@ async def reset_conversation(request: ChatRequest):
 async def health_check():
     return {"status": "healthy", "service": "Health Assistant API"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once the Gemini SDK is loaded (or at once with GENAI_PREWARM=0); /health only says the process is up"""
+    model_client = model_client_state()
+    if model_client == "cold":
+        return JSONResponse(status_code=503, content={"status": "starting", "model_client": model_client})
+    return {"status": "ready", "model_client": model_client}
+
+@app.get("/stats")
+async def stats():
+    """Session store, prompt builder and model client counters"""
+    return {
+        "sessions": session_store.stats(),
+        "prompts": chat_prompt_builder.stats(),
+        "model_clients": model_pool.stats()
+    }
+
 # Run the app with uvicorn if this file is executed directly
 if __name__ == "__main__":
     uvicorn.run("chatbot:app", host="0.0.0.0", port=8001, reload=True) 
\ No newline at end of file
@@ -0,0 +1,72 @@
+import asyncio
+import json
+import os
+import sys
+import tempfile
+
+import batch_analysis
+from genai_clients import load_sdk
+
+RECORDS = [
+    {"id": "a", "text": "I have had a fever and a dry cough for three days"},
+    {"id": "b", "body": "I think I have the flu"},
+    {"id": "c", "message": "hello"},
+    {"id": "d", "note": "no text field"},
+]
+
+def install_stub_rpcs(glm):
+    """
+    Replace Gemini's generate_content with a local stub; returns the call log.
+    Like a real call, the stub fails unless the client's gRPC channel belongs
+    to the running event loop.
+    """
+    calls = []
+
+    async def generate_content(self, request=None, **kwargs):
+        if self._client._transport.grpc_channel._loop is not asyncio.get_running_loop():
+            raise RuntimeError("gRPC channel is attached to a different loop")
+        prompt = request.contents[0].parts[0].text
+        calls.append(prompt)
+        text = "- Fever\n- Cough" if "extract any mentioned symptoms" in prompt else "Influenza (70%)"
+        return glm.GenerateContentResponse(candidates=[{
+            "content": {"role": "model", "parts": [{"text": text}]},
+            "finish_reason": "STOP",
+        }])
+
+    glm.GenerativeServiceAsyncClient.generate_content = generate_content
+    return calls
+
+def main():
+    """Run the batch_analysis CLI end to end on a small file against a stubbed Gemini"""
+    _, glm = load_sdk()
+    calls = install_stub_rpcs(glm)
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "notes.jsonl")
+        output = os.path.join(directory, "results.jsonl")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write("\n".join(json.dumps(record) for record in RECORDS) + "\n")
+
+        sys.argv = ["batch_analysis.py", source, "-o", output, "--api-key", "stub-key", "--concurrency", "2"]
+        exit_code = batch_analysis.main()
+        with open(output, encoding="utf-8") as f:
+            results = [json.loads(line) for line in f]
+
+    expected = {"a": "Influenza (70%)", "b": "Influenza (70%)", "c": None}
+    ok = [result["id"] for result in results] == [record["id"] for record in RECORDS]
+    for result in results:
+        if result["id"] in expected:
+            ok = ok and result["error"] is None and result["diagnosis"] == expected[result["id"]]
+        else:
+            ok = ok and result["error"] == "Record has no text to analyze"
+    # Only the record without text fails (exit code 1). The prefilter extracts a's symptoms and
+    # b's diagnosis comes from the response cache: one diagnosis and one extraction call.
+    ok = ok and exit_code == 1 and len(calls) == 2
+
+    for result in results:
+        print(json.dumps(result))
+    print(f"{'✅' if ok else '❌'} batch_analysis: {len(results)} results, {len(calls)} model calls, exit code {exit_code}")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+import argparse
+import sys
+
+from fastapi.testclient import TestClient
+
+import chatbot
+from genai_clients import load_sdk, model_pool
+
+STUB_REPLY = "Rest, drink fluids and consult a doctor if the fever lasts."
+
+def install_stub_rpcs(glm):
+    """
+    Replace the Gemini RPCs with local stubs; everything else (model pool,
+    clients, chat session) is the real code path. Returns the call log.
+    """
+    calls = {"generate_content": [], "create_cached_content": []}
+
+    async def generate_content(self, request=None, **kwargs):
+        calls["generate_content"].append(request)
+        return glm.GenerateContentResponse(candidates=[{
+            "content": {"role": "model", "parts": [{"text": STUB_REPLY}]},
+            "finish_reason": "STOP",
+        }])
+
+    def create_cached_content(self, request=None, **kwargs):
+        calls["create_cached_content"].append(request)
+        cached = request.cached_content
+        return glm.CachedContent(
+            name="cachedContents/stub", model=cached.model, display_name=cached.display_name,
+            usage_metadata={"total_token_count": 1}
+        )
+
+    glm.GenerativeServiceAsyncClient.generate_content = generate_content
+    glm.CacheServiceClient.create_cached_content = create_cached_content
+    return calls
+
+def run_turn(client: TestClient, mode: str, context_cache: bool, calls) -> bool:
+    """One /chat turn followed by a second on the same session; True if both reach the stubbed model"""
+    chatbot.CHAT_MODE = mode
+    chatbot.CHAT_CONTEXT_CACHE = context_cache
+    model_pool.clear()
+    for log in calls.values():
+        log.clear()
+
+    label = f"{mode}{' + context cache' if context_cache else ''}"
+    session_id = None
+    for message in ("I have a fever", "It started yesterday"):
+        response = client.post("/chat", json={"message": message, "api_key": "stub-key", "session_id": session_id})
+        if response.status_code != 200 or response.json()["response"] != STUB_REPLY:
+            print(f"❌ {label}: {response.status_code} {response.text}")
+            return False
+        session_id = response.json()["session_id"]
+
+    if len(calls["generate_content"]) != 2:
+        print(f"❌ {label}: expected 2 model calls, saw {len(calls['generate_content'])}")
+        return False
+    if context_cache and len(calls["create_cached_content"]) != 1:
+        print(f"❌ {label}: expected 1 context cache, saw {len(calls['create_cached_content'])}")
+        return False
+    if context_cache and calls["generate_content"][-1].cached_content != "cachedContents/stub":
+        print(f"❌ {label}: the model call did not use the context cache")
+        return False
+
+    print(f"✅ {label}: 2 turns, {len(calls['generate_content'])} model calls, "
+          f"{len(calls['create_cached_content'])} context caches")
+    return True
+
+def main():
+    """Run /chat end to end in every CHAT_MODE against stubbed Gemini RPCs"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.parse_args()
+
+    _, glm = load_sdk()
+    calls = install_stub_rpcs(glm)
+
+    ok = True
+    with TestClient(chatbot.app) as client:
+        for mode, context_cache in (("prompt", False), ("native", False), ("native", True)):
+            ok = run_turn(client, mode, context_cache, calls) and ok
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,84 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Import-time budgets in milliseconds, per service module (override with --budget-ms)
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "1000"))
+STARTUP_BUDGETS_MS = {
+    "feature1_fastapi": STARTUP_BUDGET_MS,
+    "chatbot": STARTUP_BUDGET_MS,
+    "doctor_appointment_api": STARTUP_BUDGET_MS,
+}
+
+def measure_import(module: str) -> float:
+    """Wall-clock time for a fresh interpreter to import module, in milliseconds"""
+    code = f"import time; start = time.perf_counter(); import {module}; print((time.perf_counter() - start) * 1000)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+def import_profile(module: str, top: int):
+    """Slowest imports (cumulative, in ms) from python -X importtime, plus whether the Gemini SDK was loaded"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        rows.append((int(cumulative_us) / 1000, name.rstrip()))
+    sdk = any(name.strip() == "google.generativeai" for _, name in rows)
+    return sorted(rows, reverse=True)[:top], sdk
+
+def main():
+    """Measure how long each service module takes to import and check it against its budget"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("modules", nargs="*", default=list(STARTUP_BUDGETS_MS), help="Modules to measure")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Budget for every module")
+    parser.add_argument("--importtime", type=int, default=0, metavar="N",
+                        help="Also show the N slowest imports of each module (python -X importtime)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Service import-time check")
+    print("=" * 60)
+
+    over_budget = False
+    for module in args.modules:
+        budget = args.budget_ms if args.budget_ms is not None else STARTUP_BUDGETS_MS.get(module, STARTUP_BUDGET_MS)
+        try:
+            timings = [measure_import(module) for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"❌ {module}: import failed\n{e.stderr}")
+            over_budget = True
+            continue
+
+        median = statistics.median(timings)
+        status = "✅" if median <= budget else "❌"
+        over_budget |= median > budget
+        print(f"{status} {module}: median {median:.0f} ms, best {min(timings):.0f} ms (budget {budget:.0f} ms)")
+
+        if args.importtime:
+            rows, sdk = import_profile(module, args.importtime)
+            for cumulative_ms, name in rows:
+                print(f"    {cumulative_ms:8.1f} ms  {name}")
+            if sdk:
+                print("    ⚠️ google.generativeai is imported at startup; it should load on first use")
+
+    return 1 if over_budget else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,98 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from service_launcher import wait_until_healthy
+
+# The two layouts: (module:app, port, readiness path) per process
+SEPARATE = [
+    ("feature1_fastapi:app", 8000, "/ready"),
+    ("chatbot:app", 8001, "/ready"),
+    ("doctor_appointment_api:app", 8002, "/ready"),
+]
+GATEWAY = [("gateway:app", 8080, "/ready")]
+
+# The same requests for both layouts: (separate-process URL, gateway URL)
+REQUESTS = [
+    ("http://localhost:8000/health", "http://localhost:8080/analyzer/health"),
+    ("http://localhost:8001/health", "http://localhost:8080/assistant/health"),
+    ("http://localhost:8002/api/specialties", "http://localhost:8080/appointments/api/specialties"),
+    ("http://localhost:8002/api/doctors/search?location=37.7749,-122.4194&radius=20",
+     "http://localhost:8080/appointments/api/doctors/search?location=37.7749,-122.4194&radius=20"),
+]
+
+def rss_mb(pid: int) -> float:
+    """Resident memory of one process in MB (psutil if installed, else /proc on Linux)"""
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / (1024 * 1024)
+    except ImportError:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    return 0.0
+
+def start(layout):
+    processes = []
+    for app, port, ready in layout:
+        cmd = [sys.executable, "-m", "uvicorn", app, "--port", str(port), "--log-level", "warning"]
+        processes.append(subprocess.Popen(cmd, cwd=os.path.dirname(os.path.abspath(__file__)),
+                                          stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for app, port, ready in layout:
+        if not wait_until_healthy(f"http://localhost:{port}{ready}", timeout=60):
+            stop(processes)
+            raise RuntimeError(f"{app} did not become ready on port {port}")
+    return processes
+
+def stop(processes) -> None:
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+def measure(urls, rounds: int):
+    """Latency in ms per request (keep-alive is not used, as with a fresh browser fetch)"""
+    for url in urls:
+        urllib.request.urlopen(url).read()  # warm-up
+    timings = []
+    for _ in range(rounds):
+        for url in urls:
+            start_time = time.perf_counter()
+            urllib.request.urlopen(url).read()
+            timings.append((time.perf_counter() - start_time) * 1000)
+    return timings
+
+def report(name: str, processes, timings) -> None:
+    rss = sum(rss_mb(process.pid) for process in processes)
+    timings = sorted(timings)
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    print(f"{name:<22} {len(processes):>9} {rss:>10.1f} {statistics.median(timings):>9.2f} {p99:>9.2f}")
+
+def main():
+    """Compare RSS and request latency: three separate API processes vs. the single gateway process"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--rounds", type=int, default=200, help="Passes over the request list per layout")
+    args = parser.parse_args()
+
+    print("=" * 64)
+    print(f"{'layout':<22} {'processes':>9} {'RSS (MB)':>10} {'p50 (ms)':>9} {'p99 (ms)':>9}")
+    print("=" * 64)
+    for name, layout, column in (("three processes", SEPARATE, 0), ("gateway", GATEWAY, 1)):
+        processes = start(layout)
+        try:
+            timings = measure([urls[column] for urls in REQUESTS], args.rounds)
+            report(name, processes, timings)
+        finally:
+            stop(processes)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
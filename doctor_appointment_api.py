@@ -1,16 +1,34 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, Path, Body
+from fastapi import FastAPI, HTTPException, Depends, Query, Path, Body, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field, EmailStr, validator
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, date, time, timedelta
-import requests
+from contextlib import asynccontextmanager
+import asyncio
+import base64
+import hashlib
 import json
 import os
 import uuid
-from geopy.distance import geodesic
+
+import numpy as np
+
+from appointment_storage import (
+    AppointmentCancelledError, IdempotencyKeyReuseError, SlotConflictError, appointment_key, create_storage,
+)
+from availability_maintenance import availability_maintainer
+from spatial_index import HAVERSINE_SLACK
+
+# Keep availability rolling forward and compact old data in the background
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    maintenance = asyncio.create_task(availability_maintainer.run_forever(lambda: db))
+    yield
+    maintenance.cancel()
 
 # Initialize FastAPI app
 app = FastAPI(
+    lifespan=lifespan,
     title="Doctor Appointment API",
     description="API for finding doctors and booking appointments",
     version="1.0.0"
@@ -23,80 +41,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Start-Date", "X-Next-Cursor"],
 )
 
-# Mock database (replace with actual database in production)
-# In a real application, you would use a proper database like PostgreSQL or MongoDB
-class MockDatabase:
-    def __init__(self):
-        self.doctors = {}
-        self.appointments = {}
-        self.users = {}
-        self.specialties = [
-            "General Practitioner",
-            "Cardiologist",
-            "Dermatologist",
-            "Neurologist",
-            "Pediatrician",
-            "Psychiatrist",
-            "Orthopedist",
-            "Gynecologist",
-            "Urologist",
-            "Ophthalmologist",
-            "ENT Specialist",
-            "Dentist"
-        ]
-        
-        # Initialize with some mock data
-        self._initialize_mock_data()
-    
-    def _initialize_mock_data(self):
-        # Create some mock doctors
-        for i in range(1, 11):
-            doctor_id = str(uuid.uuid4())
-            specialty = self.specialties[i % len(self.specialties)]
-            
-            # Create availability for the next 7 days
-            availability = []
-            for day in range(7):
-                current_date = (datetime.now() + timedelta(days=day)).strftime("%Y-%m-%d")
-                time_slots = []
-                
-                # Create time slots from 9 AM to 5 PM
-                for hour in range(9, 17):
-                    slot_id = str(uuid.uuid4())
-                    start_time = f"{hour:02d}:00"
-                    end_time = f"{hour+1:02d}:00"
-                    time_slots.append({
-                        "id": slot_id,
-                        "startTime": start_time,
-                        "endTime": end_time,
-                        "isAvailable": True
-                    })
-                
-                availability.append({
-                    "date": current_date,
-                    "timeSlots": time_slots
-                })
-            
-            self.doctors[doctor_id] = {
-                "id": doctor_id,
-                "name": f"Dr. Smith {i}",
-                "specialty": specialty,
-                "address": f"{i} Medical Street, Healthcare City",
-                "phone": f"+1-555-{i:03d}-{i*1111:04d}",
-                "email": f"doctor{i}@example.com",
-                "rating": 4.0 + (i % 10) / 10,
-                "location": {
-                    "lat": 37.7749 + (i * 0.01),
-                    "lng": -122.4194 + (i * 0.01)
-                },
-                "availability": availability,
-                "placeId": f"place_id_{i}"
-            }
-
-# Initialize mock database
-db = MockDatabase()
+# Storage backend: SQLite when APPOINTMENT_DB is set, otherwise in-memory mock data
+db = create_storage()
+
+# Most open slots one availability search returns
+MAX_SEARCH_SLOTS = 100
+# Most days one availability page returns
+MAX_AVAILABILITY_DAYS = 366
+# Most appointments one page returns
+MAX_APPOINTMENTS_PAGE = 100
 
 # Pydantic models for request/response validation
 class Location(BaseModel):
@@ -130,6 +86,14 @@ class DoctorSearchResult(BaseModel):
     doctors: List[Doctor]
     total: int
 
+class OpenSlot(BaseModel):
+    doctor: Doctor
+    date: str
+    timeSlot: TimeSlot
+
+class AvailabilitySearchResult(BaseModel):
+    slots: List[OpenSlot]
+
 class AppointmentCreate(BaseModel):
     doctorId: str
     date: str
@@ -147,6 +111,7 @@ class Appointment(BaseModel):
     doctorId: str
     userId: str
     date: str
+    timeSlotId: Optional[str] = None
     startTime: str
     endTime: str
     status: str
@@ -167,30 +132,100 @@ class HealthCheckResponse(BaseModel):
 # Helper functions
 def calculate_distance(lat1, lng1, lat2, lng2):
     """Calculate distance between two coordinates in kilometers"""
+    # Imported here: geopy is only needed once a search runs, not at startup
+    from geopy.distance import geodesic
     return geodesic((lat1, lng1), (lat2, lng2)).kilometers
 
 def find_time_slot(doctor, date, time_slot_id):
     """Find a specific time slot for a doctor on a specific date"""
-    for avail in doctor["availability"]:
-        if avail["date"] == date:
-            for slot in avail["timeSlots"]:
-                if slot["id"] == time_slot_id:
-                    return slot
-    return None
+    return db.find_time_slot(doctor["id"], date, time_slot_id)
+
+def doctors_within(lat: float, lng: float, radius: float, specialty: Optional[str]):
+    """(ids, lats, lngs, haversine_km) of the doctors within radius km, in no particular order"""
+    # Vectorized haversine distances for the doctors near the search point
+    ids, lats, lngs, approx = db.nearby_doctor_candidates(lat, lng, radius, specialty or None)
+    
+    # Haversine is within 0.5% of the geodesic distance, so only candidates
+    # in that band around the radius need the exact (slow) check
+    inside = approx * HAVERSINE_SLACK <= radius
+    for i in np.flatnonzero(~inside):
+        inside[i] = calculate_distance(lat, lng, lats[i], lngs[i]) <= radius
+    matches = np.flatnonzero(inside)
+    return [ids[i] for i in matches], lats[matches], lngs[matches], approx[matches]
+
+def find_nearby_doctors(lat: float, lng: float, radius: float, specialty: Optional[str], limit: int, offset: int):
+    """Return one page of doctors within radius km (closest first) and the total match count"""
+    offset = max(offset, 0)
+    limit = max(limit, 0)
+    
+    ids, lats, lngs, approx = doctors_within(lat, lng, radius, specialty)
+    total = len(ids)
+    
+    # Only the first offset+limit results need ordering
+    k = min(offset + limit, total)
+    if k == 0:
+        return [], total
+    top = np.argpartition(approx, k - 1)[:k] if k < total else np.arange(total)
+    page_rows = top[np.argsort(approx[top], kind="stable")][offset:]
+    doctors = db.get_doctors([ids[i] for i in page_rows])
+    
+    page = []
+    for i, doctor in zip(page_rows, doctors):
+        doctor_copy = doctor.copy()
+        doctor_copy["distance"] = round(calculate_distance(lat, lng, lats[i], lngs[i]), 2)
+        page.append(doctor_copy)
+    return page, total
+
+def parse_search_time(value: str, end: bool = False) -> datetime:
+    """A YYYY-MM-DD date or YYYY-MM-DDTHH:MM time; a date as an end bound includes the whole day"""
+    if "T" in value or " " in value:
+        return datetime.fromisoformat(value)
+    day = datetime.combine(date.fromisoformat(value), time())
+    return day + timedelta(days=1) if end else day
+
+def encode_cursor(appointment: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just after an appointment in list order"""
+    return base64.urlsafe_b64encode(json.dumps(appointment_key(appointment)).encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[str, str, str]:
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not (isinstance(key, list) and len(key) == 3 and all(isinstance(part, str) for part in key)):
+            raise ValueError
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple(key)
 
 def get_doctor_by_id(doctor_id: str):
     """Get a doctor by ID"""
-    doctor = db.doctors.get(doctor_id)
+    doctor = db.get_doctor(doctor_id)
     if not doctor:
         raise HTTPException(status_code=404, detail="Doctor not found")
     return doctor
 
+def get_appointment_by_id(appointment_id: str):
+    """Get an appointment by ID"""
+    appointment = db.get_appointment(appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    return appointment
+
 # API endpoints
 @app.get("/health", response_model=HealthCheckResponse)
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "version": "1.0.0"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Ready once storage is open and seeded, which happens at import"""
+    return {"status": "ready", "storage": type(db).__name__}
+
+@app.get("/stats")
+async def stats():
+    """Background maintenance metrics"""
+    return {"availability_maintenance": availability_maintainer.stats()}
+
 @app.get("/api/specialties", response_model=List[str])
 async def get_specialties():
     """Get list of medical specialties"""
@@ -209,38 +244,53 @@ async def search_doctors(
         # Parse location
         lat, lng = map(float, location.split(","))
         
-        # Filter doctors by specialty and distance
-        filtered_doctors = []
-        for doctor_id, doctor in db.doctors.items():
-            # Filter by specialty if provided
-            if specialty and doctor["specialty"] != specialty:
-                continue
-            
-            # Calculate distance
-            doctor_lat = doctor["location"]["lat"]
-            doctor_lng = doctor["location"]["lng"]
-            distance = calculate_distance(lat, lng, doctor_lat, doctor_lng)
-            
-            # Filter by radius
-            if distance <= radius:
-                # Add distance to doctor info
-                doctor_copy = doctor.copy()
-                doctor_copy["distance"] = round(distance, 2)
-                filtered_doctors.append(doctor_copy)
-        
-        # Sort by distance
-        filtered_doctors.sort(key=lambda x: x["distance"])
-        
-        # Apply pagination
-        paginated_doctors = filtered_doctors[offset:offset+limit]
+        paginated_doctors, total = find_nearby_doctors(lat, lng, radius, specialty, limit, offset)
         
         return {
             "doctors": paginated_doctors,
-            "total": len(filtered_doctors)
+            "total": total
         }
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Invalid search parameters: {str(e)}")
 
+@app.get("/api/availability/search", response_model=AvailabilitySearchResult)
+async def search_availability(
+    specialty: Optional[str] = Query(None, description="Medical specialty"),
+    location: Optional[str] = Query(None, description="Latitude,longitude; omit to search every doctor"),
+    radius: float = Query(10.0, description="Search radius in kilometers"),
+    from_: Optional[str] = Query(None, alias="from", description="Earliest start, YYYY-MM-DD or YYYY-MM-DDTHH:MM (default: now)"),
+    to: Optional[str] = Query(None, description="Last date (inclusive) or start time (exclusive)"),
+    limit: int = Query(10, description="Maximum number of slots")
+):
+    """Earliest open slots across every doctor matching specialty and location"""
+    try:
+        # Slots that already started cannot be booked
+        now = datetime.now().replace(second=0, microsecond=0) + timedelta(minutes=1)
+        start = max(parse_search_time(from_), now) if from_ else now
+        end = parse_search_time(to, end=True) if to else None
+        doctor_ids = None
+        if location:
+            lat, lng = map(float, location.split(","))
+            doctor_ids = doctors_within(lat, lng, radius, specialty)[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search parameters: {str(e)}")
+    
+    slots = db.earliest_free_slots(specialty or None, start, end, min(max(limit, 0), MAX_SEARCH_SLOTS), doctor_ids)
+    
+    # Doctor profiles only; their full schedules are not part of a search result
+    doctors = {doctor["id"]: doctor for doctor in db.get_doctors(list({slot["doctorId"] for slot in slots}),
+                                                                  with_availability=False)}
+    if location:
+        for doctor in doctors.values():
+            doctor["distance"] = round(calculate_distance(lat, lng, doctor["location"]["lat"], doctor["location"]["lng"]), 2)
+    
+    return {
+        "slots": [
+            {"doctor": doctors[slot["doctorId"]], "date": slot["date"], "timeSlot": slot["timeSlot"]}
+            for slot in slots
+        ]
+    }
+
 @app.get("/api/doctors/{doctor_id}", response_model=Doctor)
 async def get_doctor(
     doctor_id: str = Path(..., description="Doctor ID")
@@ -251,26 +301,44 @@ async def get_doctor(
 
 @app.get("/api/doctors/{doctor_id}/availability", response_model=List[Availability])
 async def get_doctor_availability(
+    response: Response,
     doctor_id: str = Path(..., description="Doctor ID"),
-    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
+    start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD); omit for no lower bound"),
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD), inclusive; omit for no upper bound"),
+    only_free: bool = Query(False, description="Only free slots, and only days that have one"),
+    limit: Optional[int] = Query(None, description="Maximum number of days; X-Next-Start-Date gives the next page's start_date")
 ):
     """Get available time slots for a specific doctor"""
-    doctor = get_doctor_by_id(doctor_id)
+    get_doctor_by_id(doctor_id)
     
-    # Filter availability by date range if provided
-    if start_date and end_date:
-        filtered_availability = [
-            avail for avail in doctor["availability"]
-            if start_date <= avail["date"] <= end_date
-        ]
-        return filtered_availability
+    try:
+        for value in (start_date, end_date):
+            if value:
+                date.fromisoformat(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {str(e)}")
     
-    return doctor["availability"]
+    # One day more than the page tells whether there is a next page
+    page_days = min(max(limit, 1), MAX_AVAILABILITY_DAYS) if limit is not None else None
+    days = db.get_availability(doctor_id, start_date or None, end_date or None, only_free,
+                               page_days + 1 if page_days is not None else None)
+    if page_days is not None and len(days) > page_days:
+        response.headers["X-Next-Start-Date"] = days[page_days]["date"]
+        days = days[:page_days]
+    return days
+
+def booking_request_hash(appointment: AppointmentCreate) -> str:
+    """Fingerprint of a booking request, to spot an Idempotency-Key reused for a different booking"""
+    raw = json.dumps([
+        appointment.doctorId, appointment.date, appointment.timeSlotId,
+        appointment.symptoms, appointment.notes
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
 
 @app.post("/api/appointments", response_model=Appointment)
 async def create_appointment(
-    appointment: AppointmentCreate = Body(...)
+    appointment: AppointmentCreate = Body(...),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", description="Retries with the same key return the original appointment")
 ):
     """Book a new appointment"""
     # Get doctor
@@ -281,13 +349,10 @@ async def create_appointment(
     if not time_slot:
         raise HTTPException(status_code=404, detail="Time slot not found")
     
-    # Check if time slot is available
-    if not time_slot["isAvailable"]:
+    # Check if time slot is available (a retry of a booking we already made is fine)
+    if not time_slot["isAvailable"] and not idempotency_key:
         raise HTTPException(status_code=400, detail="Time slot is not available")
     
-    # Mark time slot as unavailable
-    time_slot["isAvailable"] = False
-    
     # Create appointment
     appointment_id = str(uuid.uuid4())
     now = datetime.now().isoformat()
@@ -297,6 +362,7 @@ async def create_appointment(
         "doctorId": appointment.doctorId,
         "userId": "user_123",  # In a real app, get from authenticated user
         "date": appointment.date,
+        "timeSlotId": appointment.timeSlotId,
         "startTime": time_slot["startTime"],
         "endTime": time_slot["endTime"],
         "status": "scheduled",
@@ -306,8 +372,18 @@ async def create_appointment(
         "updatedAt": now
     }
     
-    # Store appointment
-    db.appointments[appointment_id] = new_appointment
+    # Claim the slot (compare-and-set on the version read above) and store the appointment
+    try:
+        new_appointment, created = db.book_appointment(
+            new_appointment,
+            time_slot["version"],
+            idempotency_key,
+            booking_request_hash(appointment) if idempotency_key else None
+        )
+    except SlotConflictError:
+        raise HTTPException(status_code=409, detail="Time slot is not available")
+    except IdempotencyKeyReuseError:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different booking")
     
     # Add doctor information to response
     response = new_appointment.copy()
@@ -316,22 +392,53 @@ async def create_appointment(
     return response
 
 @app.get("/api/appointments/user", response_model=List[Appointment])
-async def get_user_appointments():
-    """Get all appointments for the current user"""
+async def get_user_appointments(
+    response: Response,
+    status: Optional[str] = Query(None, description="Only appointments with this status, e.g. scheduled or cancelled"),
+    start_date: Optional[str] = Query(None, description="Earliest appointment date (YYYY-MM-DD)"),
+    end_date: Optional[str] = Query(None, description="Latest appointment date (YYYY-MM-DD), inclusive"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    limit: Optional[int] = Query(None, description="Page size; omit for every matching appointment")
+):
+    """Get the current user's appointments, ordered by date and time"""
     # In a real app, get user ID from authenticated user
     user_id = "user_123"
     
-    # Filter appointments by user ID
-    user_appointments = []
-    for appointment_id, appointment in db.appointments.items():
-        if appointment["userId"] == user_id:
-            # Add doctor information
-            appointment_copy = appointment.copy()
-            appointment_copy["doctor"] = db.doctors.get(appointment["doctorId"])
-            user_appointments.append(appointment_copy)
+    try:
+        for value in (start_date, end_date):
+            if value:
+                date.fromisoformat(value)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid date: {str(e)}")
+    after = decode_cursor(cursor) if cursor else None
+    
+    # One appointment more than the page tells whether there is a next page
+    page_size = min(max(limit, 1), MAX_APPOINTMENTS_PAGE) if limit is not None else None
+    user_appointments = db.list_user_appointments(
+        user_id, status or None, start_date or None, end_date or None, after,
+        page_size + 1 if page_size is not None else None
+    )
+    if page_size is not None and len(user_appointments) > page_size:
+        user_appointments = user_appointments[:page_size]
+        response.headers["X-Next-Cursor"] = encode_cursor(user_appointments[-1])
+    
+    # Add doctor information: each doctor's profile once, shared by their appointments
+    doctors = {doctor["id"]: doctor for doctor in db.get_doctors(list({a["doctorId"] for a in user_appointments}),
+                                                                  with_availability=False)}
+    for appointment in user_appointments:
+        appointment["doctor"] = doctors.get(appointment["doctorId"])
     
     return user_appointments
 
+@app.get("/api/doctors/{doctor_id}/appointments", response_model=List[Appointment])
+async def get_doctor_appointments(
+    doctor_id: str = Path(..., description="Doctor ID"),
+    date_: str = Query(..., alias="date", description="Date (YYYY-MM-DD)")
+):
+    """Get a doctor's appointments on one date, ordered by start time"""
+    get_doctor_by_id(doctor_id)
+    return db.list_doctor_appointments(doctor_id, date_)
+
 @app.put("/api/appointments/{appointment_id}", response_model=Appointment)
 async def update_appointment(
     appointment_id: str = Path(..., description="Appointment ID"),
@@ -339,17 +446,15 @@ async def update_appointment(
 ):
     """Update an existing appointment"""
     # Check if appointment exists
-    if appointment_id not in db.appointments:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    appointment = db.appointments[appointment_id]
-    
-    # Update appointment
-    if appointment_update.notes is not None:
-        appointment["notes"] = appointment_update.notes
+    appointment = get_appointment_by_id(appointment_id)
     
     # If rescheduling
+    new_time_slot = None
     if appointment_update.date and appointment_update.timeSlotId:
+        # A cancelled appointment has no slot to move
+        if appointment["status"] == "cancelled":
+            raise HTTPException(status_code=400, detail="Cannot reschedule a cancelled appointment")
+        
         # Get doctor
         doctor = get_doctor_by_id(appointment["doctorId"])
         
@@ -361,26 +466,23 @@ async def update_appointment(
         # Check if new time slot is available
         if not new_time_slot["isAvailable"]:
             raise HTTPException(status_code=400, detail="Time slot is not available")
-        
-        # Find old time slot and mark it as available
-        old_time_slot = find_time_slot(doctor, appointment["date"], appointment["timeSlotId"])
-        if old_time_slot:
-            old_time_slot["isAvailable"] = True
-        
-        # Mark new time slot as unavailable
-        new_time_slot["isAvailable"] = False
-        
-        # Update appointment
-        appointment["date"] = appointment_update.date
-        appointment["startTime"] = new_time_slot["startTime"]
-        appointment["endTime"] = new_time_slot["endTime"]
     
-    # Update timestamp
-    appointment["updatedAt"] = datetime.now().isoformat()
+    # Claiming the new slot, freeing the old one and saving happen as one step in storage
+    try:
+        appointment = db.update_appointment(
+            appointment_id, datetime.now().isoformat(), notes=appointment_update.notes,
+            time_slot=new_time_slot, date=appointment_update.date
+        )
+    except SlotConflictError:
+        raise HTTPException(status_code=409, detail="Time slot is not available")
+    except AppointmentCancelledError:
+        raise HTTPException(status_code=400, detail="Cannot reschedule a cancelled appointment")
+    if appointment is None:
+        raise HTTPException(status_code=404, detail="Appointment not found")
     
     # Add doctor information to response
     response = appointment.copy()
-    response["doctor"] = db.doctors.get(appointment["doctorId"])
+    response["doctor"] = db.get_doctor(appointment["doctorId"])
     
     return response
 
@@ -389,24 +491,11 @@ async def cancel_appointment(
     appointment_id: str = Path(..., description="Appointment ID")
 ):
     """Cancel an appointment"""
-    # Check if appointment exists
-    if appointment_id not in db.appointments:
+    # Only the request that changes the status frees the slot, so cancelling twice
+    # never frees a slot someone else has booked since
+    if db.cancel_appointment(appointment_id, datetime.now().isoformat()) is None:
         raise HTTPException(status_code=404, detail="Appointment not found")
     
-    appointment = db.appointments[appointment_id]
-    
-    # Get doctor
-    doctor = get_doctor_by_id(appointment["doctorId"])
-    
-    # Find time slot and mark it as available
-    time_slot = find_time_slot(doctor, appointment["date"], appointment["timeSlotId"])
-    if time_slot:
-        time_slot["isAvailable"] = True
-    
-    # Update appointment status
-    appointment["status"] = "cancelled"
-    appointment["updatedAt"] = datetime.now().isoformat()
-    
     return {"message": "Appointment cancelled successfully"}
 
 @app.post("/api/notifications/send")
@@ -415,10 +504,7 @@ async def send_notification(
 ):
     """Send appointment confirmation or reminder"""
     # Check if appointment exists
-    if notification.appointmentId not in db.appointments:
-        raise HTTPException(status_code=404, detail="Appointment not found")
-    
-    appointment = db.appointments[notification.appointmentId]
+    appointment = get_appointment_by_id(notification.appointmentId)
     
     # In a real app, integrate with Twilio/SendGrid to send notifications
     # For now, just return a success message
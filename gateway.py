@@ -0,0 +1,63 @@
+from contextlib import AsyncExitStack, asynccontextmanager
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+import uvicorn
+
+import chatbot
+import doctor_appointment_api
+import feature1_fastapi
+from genai_clients import model_client_state
+
+# Path prefix -> mounted service. Importing all three into one process means they share
+# one Gemini client pool, one analysis cache, one session store and one appointment store.
+MOUNTS = {
+    "/analyzer": feature1_fastapi.app,
+    "/assistant": chatbot.app,
+    "/appointments": doctor_appointment_api.app,
+}
+
+# Mounted apps get no lifespan events of their own, so the gateway runs theirs
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    async with AsyncExitStack() as stack:
+        for mounted in MOUNTS.values():
+            await stack.enter_async_context(mounted.router.lifespan_context(mounted))
+        yield
+
+# Initialize FastAPI app
+app = FastAPI(
+    lifespan=lifespan,
+    title="Health Assistant Gateway",
+    description="Symptom Analyzer, Health Assistant and Doctor Appointment APIs in one process",
+    version="1.0.0"
+)
+
+# Add CORS middleware to allow cross-origin requests
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # For production, replace with specific origins
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+@app.get("/health")
+async def health_check():
+    return {"status": "healthy", "service": "Health Assistant Gateway", "mounts": list(MOUNTS)}
+
+@app.get("/ready")
+async def readiness_check():
+    """Ready once the Gemini SDK is loaded (or at once with GENAI_PREWARM=0); /health only says the process is up"""
+    model_client = model_client_state()
+    if model_client == "cold":
+        return JSONResponse(status_code=503, content={"status": "starting", "model_client": model_client})
+    return {"status": "ready", "model_client": model_client}
+
+for prefix, mounted in MOUNTS.items():
+    app.mount(prefix, mounted)
+
+# Run the app with uvicorn if this file is executed directly
+if __name__ == "__main__":
+    uvicorn.run("gateway:app", host="0.0.0.0", port=8080, reload=True)
@@ -0,0 +1,215 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from typing import Any, Dict, Optional, Tuple
+
+# Pool limits, shared by every service that imports this module
+GENAI_CLIENT_POOL_SIZE = int(os.getenv("GENAI_CLIENT_POOL_SIZE", "32"))
+GENAI_CLIENT_TTL_SECONDS = float(os.getenv("GENAI_CLIENT_TTL_SECONDS", "3600"))
+
+# Lifetime of a provider-side context cache holding a system instruction
+GENAI_CONTEXT_CACHE_TTL_SECONDS = float(os.getenv("GENAI_CONTEXT_CACHE_TTL_SECONDS", "3600"))
+
+# Load the SDK in the background right after startup ("0" = wait for the first request)
+GENAI_PREWARM = os.getenv("GENAI_PREWARM", "1") != "0"
+
+# The Gemini SDK takes most of a service's import time, so it is imported on first use
+_sdk: Optional[Tuple[Any, Any]] = None
+_sdk_lock = threading.Lock()
+
+def load_sdk() -> Tuple[Any, Any]:
+    """Import and return (google.generativeai, google.ai.generativelanguage)"""
+    global _sdk
+    with _sdk_lock:
+        if _sdk is None:
+            import google.ai.generativelanguage as glm
+            import google.generativeai as genai
+            _sdk = (genai, glm)
+    return _sdk
+
+def sdk_loaded() -> bool:
+    return _sdk is not None
+
+def model_client_state() -> str:
+    """The SDK as /ready sees it: "warm" (loaded), "cold" (loading) or "deferred" (GENAI_PREWARM=0)"""
+    if _sdk is not None:
+        return "warm"
+    return "cold" if GENAI_PREWARM else "deferred"
+
+def start_warm_up() -> None:
+    """Load the SDK on a background thread so neither startup nor the first request waits for it"""
+    if GENAI_PREWARM and _sdk is None:
+        threading.Thread(target=load_sdk, name="genai-warm-up", daemon=True).start()
+
+class ModelClientPool:
+    """
+    LRU/TTL pool of Gemini models keyed by API key and model name.
+
+    Each API key gets its own generative service clients instead of going
+    through genai.configure(), which is process-wide state and races when
+    concurrent requests use different keys. The clients (and their gRPC
+    channels) are reused until the entry is evicted.
+
+    With context_cache=True the system instruction is stored once in a
+    provider-side context cache and the model reads it from there. The pool
+    entry expires shortly before the cache does. If the provider refuses
+    (some models do not support caching, and it has a minimum size), the
+    plain model is used until the next attempt one TTL later.
+    """
+
+    def __init__(self, max_size: int = GENAI_CLIENT_POOL_SIZE, ttl_seconds: float = GENAI_CLIENT_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Tuple, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.context_caches = 0
+        self.context_cache_failures = 0
+        self.last_context_cache_error: Optional[str] = None
+
+    def _lookup(self, key: Tuple, now: float):
+        """The pooled model for key, or None (counting the hit or miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (now - entry["last_used"] > self.ttl_seconds or now >= entry["expires_at"]):
+                del self._entries[key]
+                self.evictions += 1
+                entry = None
+
+            if entry is not None:
+                entry["last_used"] = now
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["model"]
+
+            self.misses += 1
+            return None
+
+    def _store(self, key: Tuple, model, now: float, expires_at: float):
+        with self._lock:
+            # Another request may have created the same entry meanwhile
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry["last_used"] = now
+                self._entries.move_to_end(key)
+                return entry["model"]
+
+            self._entries[key] = {"model": model, "last_used": now, "expires_at": expires_at}
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return model
+
+    def get(self, api_key: str, model_name: str, system_instruction: Optional[str] = None,
+            context_cache: bool = False):
+        """
+        Return a cached model for this key, creating one on a miss.
+
+        Call it on the thread running the event loop that will use the model:
+        the async client binds to that loop when it is created. With
+        context_cache, a miss makes a blocking call to the provider; async
+        code should use get_async instead.
+        """
+        context_cache = context_cache and bool(system_instruction)
+        key = (api_key, model_name, system_instruction, context_cache)
+        now = time.monotonic()
+        model = self._lookup(key, now)
+        if model is not None:
+            return model
+
+        if context_cache:
+            cached = self._create_context_cache(api_key, model_name, system_instruction)
+            model, expires_at = self._create_cached_model(api_key, model_name, system_instruction, cached, now)
+        else:
+            model, expires_at = self._create_model(api_key, model_name, system_instruction), float("inf")
+        return self._store(key, model, now, expires_at)
+
+    async def get_async(self, api_key: str, model_name: str, system_instruction: Optional[str] = None,
+                        context_cache: bool = False):
+        """
+        Like get(), but creating a context cache runs on a worker thread.
+        Only that call leaves the event loop; the model and its clients are
+        built on the loop's thread.
+        """
+        context_cache = context_cache and bool(system_instruction)
+        key = (api_key, model_name, system_instruction, context_cache)
+        now = time.monotonic()
+        model = self._lookup(key, now)
+        if model is not None:
+            return model
+
+        if context_cache:
+            cached = await asyncio.to_thread(self._create_context_cache, api_key, model_name, system_instruction)
+            model, expires_at = self._create_cached_model(api_key, model_name, system_instruction, cached, now)
+        else:
+            model, expires_at = self._create_model(api_key, model_name, system_instruction), float("inf")
+        return self._store(key, model, now, expires_at)
+
+    def _create_model(self, api_key: str, model_name: str, system_instruction: Optional[str]):
+        genai, glm = load_sdk()
+        model = genai.GenerativeModel(model_name=model_name, system_instruction=system_instruction)
+        client_options = {"api_key": api_key}
+        model._client = glm.GenerativeServiceClient(client_options=client_options)
+        model._async_client = glm.GenerativeServiceAsyncClient(client_options=client_options)
+        return model
+
+    def _create_context_cache(self, api_key: str, model_name: str, system_instruction: str):
+        """Store the system instruction in a provider-side context cache (blocking); None if refused"""
+        _, glm = load_sdk()
+        from google.generativeai import caching
+
+        try:
+            request = caching.CachedContent._prepare_create_request(
+                model_name, system_instruction=system_instruction,
+                ttl=timedelta(seconds=GENAI_CONTEXT_CACHE_TTL_SECONDS)
+            )
+            cache_client = glm.CacheServiceClient(client_options={"api_key": api_key})
+            return caching.CachedContent._from_obj(cache_client.create_cached_content(request, timeout=30))
+        except Exception as e:
+            with self._lock:
+                self.context_cache_failures += 1
+                self.last_context_cache_error = str(e)
+            return None
+
+    def _create_cached_model(self, api_key: str, model_name: str, system_instruction: str, cached, now: float):
+        """(model reading the system instruction from the context cache, when the pool entry must expire)"""
+        ttl = GENAI_CONTEXT_CACHE_TTL_SECONDS
+        if cached is None:
+            # Plain model until the next attempt one TTL later
+            return self._create_model(api_key, model_name, system_instruction), now + ttl
+
+        genai, glm = load_sdk()
+        model = genai.GenerativeModel.from_cached_content(cached)
+        client_options = {"api_key": api_key}
+        model._client = glm.GenerativeServiceClient(client_options=client_options)
+        model._async_client = glm.GenerativeServiceAsyncClient(client_options=client_options)
+        with self._lock:
+            self.context_caches += 1
+        # Leave a margin so no request reaches the provider with an expired cache
+        return model, now + ttl * 0.9
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "context_caches": self.context_caches,
+                "context_cache_failures": self.context_cache_failures,
+                "last_context_cache_error": self.last_context_cache_error,
+            }
+
+# Process-wide pool
+model_pool = ModelClientPool()
@@ -0,0 +1,80 @@
+import argparse
+import asyncio
+import sys
+import time
+
+import httpx
+
+import feature1_fastapi
+from response_cache import ResponseCache
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+class StubModel:
+    """Stand-in for a Gemini model that answers after a fixed delay"""
+    def __init__(self, latency: float, blocking: bool):
+        self.latency = latency
+        self.blocking = blocking
+        self.calls = 0
+
+    async def generate_content_async(self, prompt):
+        if self.blocking:
+            # What the old handler did: a synchronous call inside the event loop
+            time.sleep(self.latency)
+        else:
+            await asyncio.sleep(self.latency)
+        # A distinct answer per call, so no two diagnosis requests are coalesced
+        self.calls += 1
+        return StubResponse(f"- Fever\n- Sore throat ({self.calls})")
+
+async def run_load(requests_count: int, latency: float, blocking: bool) -> float:
+    """Send requests_count concurrent /analyze calls and return the elapsed time"""
+    stub = StubModel(latency, blocking)
+    feature1_fastapi.initialize_genai = lambda api_key: stub
+    # Each asyncio.run() gets a fresh loop, so drop the semaphore bound to the last one
+    feature1_fastapi._genai_semaphore = None
+    # Every request must reach the stub model, so run without the response cache or the local prefilter
+    feature1_fastapi.analysis_cache = ResponseCache(max_entries=0, db_path=None)
+    feature1_fastapi.symptom_prefilter.enabled = False
+
+    transport = httpx.ASGITransport(app=feature1_fastapi.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(
+            # Distinct texts, so identical in-flight requests are not coalesced into one call
+            *(client.post("/analyze", json={"text": f"I have a fever and sore throat (patient {i})", "api_key": "stub"},
+                          timeout=None) for i in range(requests_count))
+        )
+        elapsed = time.perf_counter() - start
+
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        print(f"❌ {len(failed)} requests failed, first: {failed[0].status_code} {failed[0].text}")
+    return elapsed
+
+def main():
+    """Compare /analyze throughput with a blocking vs. an async stub model"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--requests", type=int, default=20, help="Concurrent requests to send")
+    parser.add_argument("--latency", type=float, default=0.2, help="Stub latency per model call (seconds)")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print(f"Load test: {args.requests} concurrent /analyze requests, "
+          f"2 model calls each at {args.latency}s, concurrency limit {feature1_fastapi.GENAI_MAX_CONCURRENCY}")
+    print("=" * 60)
+
+    results = {}
+    for label, blocking in (("blocking", True), ("async", False)):
+        elapsed = asyncio.run(run_load(args.requests, args.latency, blocking))
+        results[label] = elapsed
+        print(f"{label:>9}: {elapsed:6.2f}s total, {args.requests / elapsed:7.1f} req/s")
+
+    print("-" * 60)
+    print(f"Speedup: {results['blocking'] / results['async']:.1f}x")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,283 @@
+import asyncio
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import urllib.request
+from datetime import datetime
+from importlib.util import find_spec
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+logger = logging.getLogger("service_launcher")
+
+# "dev" runs one auto-reloading worker per service; "prod" runs several workers without reload
+LAUNCH_MODE = os.getenv("LAUNCH_MODE", "dev")
+# Default worker count per service in prod mode (each service can override it with its own variable)
+SERVICE_WORKERS = int(os.getenv("SERVICE_WORKERS", "2"))
+# Stores an app keeps in process memory unless the named variable points it at a shared
+# database. Until every one is set, the app runs one worker: each worker would otherwise
+# hold its own copy (doctors and bookings created on one worker 404 on another, a chat
+# session continued on another worker starts over).
+SHARED_STATE_ENV = {
+    "chatbot:app": ("CHAT_SESSION_DB",),
+    "doctor_appointment_api:app": ("APPOINTMENT_DB",),
+    "gateway:app": ("APPOINTMENT_DB", "CHAT_SESSION_DB"),
+}
+# Seconds a stopping service gets to finish in-flight requests before it is killed
+SERVICE_DRAIN_SECONDS = float(os.getenv("SERVICE_DRAIN_SECONDS", "30"))
+# Restart delay after a crash doubles from the initial value up to the maximum
+RESTART_BACKOFF_INITIAL_SECONDS = float(os.getenv("RESTART_BACKOFF_INITIAL_SECONDS", "1"))
+RESTART_BACKOFF_MAX_SECONDS = float(os.getenv("RESTART_BACKOFF_MAX_SECONDS", "30"))
+# A service that stayed up this long is considered healthy again and the backoff resets
+RESTART_BACKOFF_RESET_SECONDS = 60.0
+
+# Longest log line passed through; longer lines are dropped
+MAX_LINE_BYTES = 1 << 20
+# How long to keep reading output after a service's main process has exited
+PUMP_GRACE_SECONDS = 5.0
+
+class ManagedService:
+    """One uvicorn app run under the supervisor"""
+
+    def __init__(self, name: str, app: str, port: int, workers: Optional[int] = None,
+                 mode: str = LAUNCH_MODE, host: str = "0.0.0.0", workers_env: Optional[str] = None,
+                 drain_seconds: float = SERVICE_DRAIN_SECONDS, shared_state_env: Optional[Sequence[str]] = None):
+        self.name = name
+        self.app = app
+        self.port = port
+        self.host = host
+        self.mode = mode
+        if workers is None:
+            workers = int(os.getenv(workers_env, SERVICE_WORKERS)) if workers_env else SERVICE_WORKERS
+        self.workers = max(1, workers)
+        self.shared_state_env = list(SHARED_STATE_ENV.get(app, ()) if shared_state_env is None else shared_state_env)
+        self.drain_seconds = drain_seconds
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.restarts = 0
+
+    @property
+    def url(self) -> str:
+        return f"http://localhost:{self.port}"
+
+    @property
+    def unshared_state(self) -> List[str]:
+        """Variables in shared_state_env that are unset, so their store lives in each worker"""
+        return [name for name in self.shared_state_env if not os.getenv(name)]
+
+    @property
+    def effective_workers(self) -> int:
+        """Workers actually started in prod mode: one while any store is per worker"""
+        return 1 if self.unshared_state else self.workers
+
+    @property
+    def command(self) -> List[str]:
+        cmd = [sys.executable, "-m", "uvicorn", self.app, "--host", self.host, "--port", str(self.port)]
+        if self.mode != "prod":
+            return cmd + ["--reload"]
+
+        # uvloop and httptools are much faster than the pure-Python defaults; use them when installed
+        loop = "uvloop" if sys.platform != "win32" and find_spec("uvloop") else "asyncio"
+        http = "httptools" if find_spec("httptools") else "h11"
+        return cmd + [
+            "--workers", str(self.effective_workers),
+            "--loop", loop,
+            "--http", http,
+            "--timeout-graceful-shutdown", f"{self.drain_seconds:g}",
+            "--no-server-header",
+        ]
+
+def wait_until_healthy(url: str, timeout: float = 30.0, interval: float = 0.5) -> bool:
+    """Poll url until it answers 200 or timeout passes (blocking; run it in an executor)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except OSError:
+            pass
+        time.sleep(interval)
+    return False
+
+async def run_in_daemon_thread(func, *args):
+    """Await a blocking call on a daemon thread, so a pending call (e.g. input()) never blocks exit"""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(result=None, error=None):
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def target():
+        try:
+            outcome = (func(*args), None)
+        except Exception as e:
+            outcome = (None, e)
+        try:
+            loop.call_soon_threadsafe(deliver, *outcome)
+        except RuntimeError:
+            pass  # the loop already closed; nobody is waiting any more
+
+    threading.Thread(target=target, daemon=True).start()
+    return await future
+
+class ServiceSupervisor:
+    """
+    Runs services as child processes on one asyncio loop.
+
+    Each child's stdout and stderr are read by their own tasks, so a quiet
+    service never holds up the output of a chatty one. A crashed service is
+    restarted with exponential backoff. SIGINT/SIGTERM send SIGTERM to every
+    child, which makes uvicorn stop accepting connections and finish in-flight
+    requests; anything still running after the drain timeout is killed.
+    """
+
+    def __init__(self, services: List[ManagedService], restart: bool = True):
+        self.services = services
+        self.restart = restart
+        self._stopping: Optional[asyncio.Event] = None
+
+    def request_stop(self) -> None:
+        if self._stopping is not None and not self._stopping.is_set():
+            logger.info("Stopping all services...")
+            self._stopping.set()
+
+    def _install_signal_handlers(self, loop: asyncio.AbstractEventLoop) -> None:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.request_stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows: no loop signal handlers, fall back to the signal module
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.request_stop))
+
+    async def _pump(self, service: ManagedService, stream: asyncio.StreamReader, label: str) -> None:
+        while True:
+            try:
+                line = await stream.readline()
+            except ValueError:
+                print(f"[{service.name}{label}] <line longer than {MAX_LINE_BYTES} bytes dropped>", flush=True)
+                continue
+            if not line:
+                return
+            timestamp = datetime.now().strftime("%H:%M:%S")
+            text = line.decode(errors="replace").rstrip()
+            print(f"[{timestamp}] [{service.name}{label}] {text}", flush=True)
+
+    async def _start(self, service: ManagedService) -> asyncio.subprocess.Process:
+        if service.mode == "prod" and service.effective_workers < service.workers:
+            logger.warning(
+                f"{service.name}: running 1 worker instead of {service.workers}; "
+                f"set {' and '.join(service.unshared_state)} to share state across workers"
+            )
+        kwargs = {"start_new_session": True} if sys.platform != "win32" else {}
+        process = await asyncio.create_subprocess_exec(
+            *service.command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            limit=MAX_LINE_BYTES,
+            **kwargs
+        )
+        service.process = process
+        logger.info(f"{service.name} started with PID {process.pid} ({service.mode}, {service.url})")
+        return process
+
+    async def _stop(self, service: ManagedService) -> None:
+        process = service.process
+        if process is None or process.returncode is not None:
+            return
+
+        logger.info(f"Draining {service.name} (PID {process.pid})...")
+        process.terminate()
+        try:
+            await asyncio.wait_for(process.wait(), timeout=service.drain_seconds + 5)
+            logger.info(f"{service.name} stopped")
+        except asyncio.TimeoutError:
+            logger.warning(f"{service.name} did not stop within {service.drain_seconds:g}s, killing...")
+            if sys.platform != "win32":
+                try:
+                    os.killpg(process.pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+            else:
+                process.kill()
+            await process.wait()
+
+    async def _supervise(self, service: ManagedService) -> None:
+        backoff = RESTART_BACKOFF_INITIAL_SECONDS
+        while not self._stopping.is_set():
+            started = time.monotonic()
+            try:
+                process = await self._start(service)
+            except OSError as e:
+                logger.error(f"Could not start {service.name}: {e}")
+                process = None
+
+            if process is not None:
+                pumps = [
+                    asyncio.ensure_future(self._pump(service, process.stdout, "")),
+                    asyncio.ensure_future(self._pump(service, process.stderr, " ERROR")),
+                ]
+                exited = asyncio.ensure_future(process.wait())
+                stopping = asyncio.ensure_future(self._stopping.wait())
+                await asyncio.wait([exited, stopping], return_when=asyncio.FIRST_COMPLETED)
+                stopping.cancel()
+
+                if self._stopping.is_set():
+                    await self._stop(service)
+                await exited
+                # Orphaned grandchildren could hold the pipes open; don't wait on them forever
+                _, pending = await asyncio.wait(pumps, timeout=PUMP_GRACE_SECONDS)
+                for pump in pending:
+                    pump.cancel()
+                if self._stopping.is_set():
+                    return
+                logger.warning(f"{service.name} exited with code {process.returncode}")
+
+            if not self.restart:
+                return
+
+            if time.monotonic() - started > RESTART_BACKOFF_RESET_SECONDS:
+                backoff = RESTART_BACKOFF_INITIAL_SECONDS
+            logger.info(f"Restarting {service.name} in {backoff:g}s...")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=backoff)
+                return
+            except asyncio.TimeoutError:
+                pass
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX_SECONDS)
+            service.restarts += 1
+
+    async def run(self, after_start: Optional[Callable[[], Awaitable[None]]] = None) -> int:
+        """Run until stopped (or, without restarts, until every service exits)"""
+        self._stopping = asyncio.Event()
+        self._install_signal_handlers(asyncio.get_running_loop())
+
+        tasks = [asyncio.ensure_future(self._supervise(service)) for service in self.services]
+        if after_start is not None:
+            hook = asyncio.ensure_future(after_start())
+            tasks_done = asyncio.ensure_future(asyncio.gather(*tasks))
+            await asyncio.wait([hook, tasks_done], return_when=asyncio.FIRST_COMPLETED)
+            if not hook.done():
+                hook.cancel()
+            elif not hook.cancelled() and hook.exception() is not None:
+                logger.error(f"Startup hook failed: {hook.exception()}")
+            await tasks_done
+        else:
+            await asyncio.gather(*tasks)
+
+        return 0 if self._stopping.is_set() else 1
+
+def add_launch_arguments(parser) -> None:
+    """Shared --mode/--workers/--drain options for the launcher scripts"""
+    parser.add_argument("--mode", choices=["dev", "prod"], default=LAUNCH_MODE,
+                        help="dev: one auto-reloading worker; prod: several workers, uvloop/httptools, no reload")
+    parser.add_argument("--workers", type=int, default=None,
+                        help=f"Workers per service in prod mode (default SERVICE_WORKERS={SERVICE_WORKERS})")
+    parser.add_argument("--drain", type=float, default=SERVICE_DRAIN_SECONDS,
+                        help="Seconds to let in-flight requests finish on shutdown")
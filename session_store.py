@@ -0,0 +1,392 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+# Limits for the chat session store
+CHAT_SESSION_MAX_MESSAGES = int(os.getenv("CHAT_SESSION_MAX_MESSAGES", "20"))
+CHAT_SESSION_MAX_SESSIONS = int(os.getenv("CHAT_SESSION_MAX_SESSIONS", "10000"))
+CHAT_SESSION_TTL_SECONDS = float(os.getenv("CHAT_SESSION_TTL_SECONDS", "3600"))
+CHAT_SESSION_MAX_BYTES = int(os.getenv("CHAT_SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+CHAT_SESSION_DB = os.getenv("CHAT_SESSION_DB")  # e.g. "chat_sessions.sqlite3"; unset = memory only
+
+# Expired rows are swept from SQLite once every this many writes
+PRUNE_EVERY_WRITES = 256
+
+SCHEMA_VERSION = 2
+
+CHAT_MESSAGES_TABLE = """CREATE TABLE IF NOT EXISTS chat_messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID"""
+
+SCHEMA = [
+    # version: bumped by every write, so a worker can tell its copy is stale
+    # cleared_seq: messages below it were removed by a reset, not dropped as the buffer filled
+    """CREATE TABLE IF NOT EXISTS chat_sessions (
+        session_id TEXT PRIMARY KEY,
+        last_used REAL NOT NULL,
+        next_seq INTEGER NOT NULL,
+        version INTEGER NOT NULL,
+        cleared_seq INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_chat_sessions_last_used ON chat_sessions (last_used)",
+    CHAT_MESSAGES_TABLE,
+]
+
+# Version 0 kept each session's messages as one JSON list, rewritten on every turn
+MIGRATIONS = {
+    0: [
+        "ALTER TABLE chat_sessions RENAME TO chat_sessions_v0",
+        "DROP INDEX IF EXISTS idx_chat_sessions_last_used",
+        """CREATE TABLE chat_sessions (
+            session_id TEXT PRIMARY KEY,
+            last_used REAL NOT NULL,
+            next_seq INTEGER NOT NULL,
+            version INTEGER NOT NULL
+        )""",
+        "CREATE INDEX idx_chat_sessions_last_used ON chat_sessions (last_used)",
+        CHAT_MESSAGES_TABLE,
+        """INSERT INTO chat_messages (session_id, seq, role, content)
+           SELECT s.session_id, COALESCE(json_extract(m.value, '$.seq'), m.key),
+                  json_extract(m.value, '$.role'), json_extract(m.value, '$.content')
+           FROM chat_sessions_v0 s, json_each(s.messages) m""",
+        """INSERT INTO chat_sessions (session_id, last_used, next_seq, version)
+           SELECT s.session_id, s.last_used,
+                  COALESCE((SELECT MAX(seq) + 1 FROM chat_messages m WHERE m.session_id = s.session_id), 0), 1
+           FROM chat_sessions_v0 s""",
+        "DROP TABLE chat_sessions_v0",
+    ],
+    1: ["ALTER TABLE chat_sessions ADD COLUMN cleared_seq INTEGER NOT NULL DEFAULT 0"],
+}
+
+class SessionStore:
+    """
+    Bounded store of chat conversation histories.
+
+    Each session keeps only its most recent messages in a ring buffer. Whole
+    sessions are evicted least-recently-used first when the store holds too
+    many sessions or too many bytes of message text (UTF-8), and after sitting
+    idle for the TTL. With a SQLite file configured, every message is also
+    appended on disk, so sessions survive restarts and are shared by all
+    workers on the host: each session row carries a version bumped by every
+    write, and a worker re-reads a session whose version moved on.
+
+    Listeners added with add_eviction_listener() see the messages a session's
+    buffer drops, oldest first, so they can be summarized before they are
+    gone; listeners added with add_reset_listener() learn of reset sessions,
+    including resets by another worker.
+    """
+
+    def __init__(self, max_messages: int = CHAT_SESSION_MAX_MESSAGES,
+                 max_sessions: int = CHAT_SESSION_MAX_SESSIONS,
+                 ttl_seconds: float = CHAT_SESSION_TTL_SECONDS,
+                 max_bytes: int = CHAT_SESSION_MAX_BYTES,
+                 db_path: Optional[str] = CHAT_SESSION_DB):
+        self.max_messages = max_messages
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        # session id -> {"messages": deque, "bytes": int, "last_used": float, "next_seq": int, "version": int,
+        # "cleared_seq": int}, oldest first
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._eviction_listeners: List[Callable[[str, List[Dict[str, Any]]], None]] = []
+        self._reset_listeners: List[Callable[[str], None]] = []
+        self._writes = 0
+        self.total_bytes = 0
+        self.created = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+        self.evicted_memory = 0
+
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None, timeout=30)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._create_schema()
+
+    def _create_schema(self) -> None:
+        # BEGIN IMMEDIATE takes the write lock, so concurrent workers migrate only once
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            has_tables = self._db.execute(
+                "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = 'chat_sessions'"
+            ).fetchone()[0]
+            if has_tables:
+                while version in MIGRATIONS:
+                    for statement in MIGRATIONS[version]:
+                        self._db.execute(statement)
+                    version += 1
+                if version != SCHEMA_VERSION:
+                    raise RuntimeError(
+                        f"{self.db_path} has schema version {version}, expected {SCHEMA_VERSION}; "
+                        "migrate or remove the file"
+                    )
+            for statement in SCHEMA:
+                self._db.execute(statement)
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+
+    def add_eviction_listener(self, listener: Callable[[str, List[Dict[str, Any]]], None]) -> None:
+        """Call listener(session_id, messages) with the messages a session's buffer drops (under the store lock)"""
+        self._eviction_listeners.append(listener)
+
+    def add_reset_listener(self, listener: Callable[[str], None]) -> None:
+        """Call listener(session_id) whenever a session's history is reset (under the store lock)"""
+        self._reset_listeners.append(listener)
+
+    def _dropped(self, session_id: str, messages: List[Dict[str, Any]]) -> None:
+        if messages:
+            for listener in self._eviction_listeners:
+                listener(session_id, messages)
+
+    def _was_reset(self, session_id: str) -> None:
+        for listener in self._reset_listeners:
+            listener(session_id)
+
+    @staticmethod
+    def new_session_id() -> str:
+        return f"session_{uuid.uuid4().hex}"
+
+    @staticmethod
+    def _size(message: Dict[str, Any]) -> int:
+        return len(message["content"].encode())
+
+    def _load(self, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        """Find a live session in memory or on disk, marking it most recently used"""
+        session = self._sessions.get(session_id)
+        if session is not None and now - session["last_used"] > self.ttl_seconds:
+            self._drop(session_id)
+            self.evicted_idle += 1
+            session = None
+
+        if self._db is not None:
+            # The disk copy is authoritative: another worker may have written since
+            row = self._db.execute(
+                "SELECT version, last_used FROM chat_sessions WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if session is not None:
+                    self._drop(session_id)
+                self.misses += 1
+                return None
+            if session is None or session["version"] != row[0]:
+                session = self._reload(session_id, now)
+                self.disk_hits += 1
+                return session
+
+        if session is None:
+            self.misses += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        session["last_used"] = now
+        self.hits += 1
+        return session
+
+    def _reload(self, session_id: str, now: float) -> Dict[str, Any]:
+        """Replace the in-memory copy of a session with the one on disk, reporting what it lost meanwhile"""
+        head = self._db.execute(
+            "SELECT next_seq, version, cleared_seq FROM chat_sessions WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        rows = self._db.execute(
+            "SELECT seq, role, content FROM chat_messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+            (session_id, self.max_messages),
+        ).fetchall()
+        messages = [{"role": role, "content": content, "seq": seq} for seq, role, content in reversed(rows)]
+        old = self._sessions.get(session_id)
+        if old is not None:
+            self._drop(session_id)
+        session = self._remember(session_id, messages, now, next_seq=head[0], version=head[1], cleared_seq=head[2])
+
+        if old is not None:
+            # Another worker wrote to the session: it may have reset it, or appended enough to push
+            # messages we held out of the buffer
+            if head[2] > old["cleared_seq"]:
+                self._was_reset(session_id)
+            first_seq = messages[0]["seq"] if messages else head[0]
+            self._dropped(session_id, [m for m in old["messages"] if head[2] <= m["seq"] < first_seq])
+        return session
+
+    def _remember(self, session_id: str, messages: List[Dict[str, Any]], now: float,
+                  next_seq: Optional[int] = None, version: int = 0, cleared_seq: int = 0) -> Dict[str, Any]:
+        buffer: Deque[Dict[str, Any]] = deque(messages, maxlen=self.max_messages)
+        # Each message gets a per-session sequence number, so callers can tell which they have seen
+        if next_seq is None:
+            next_seq = buffer[-1].get("seq", len(buffer) - 1) + 1 if buffer else 0
+        session = {"messages": buffer, "bytes": sum(self._size(m) for m in buffer), "last_used": now,
+                   "next_seq": next_seq, "version": version, "cleared_seq": cleared_seq}
+        self._sessions[session_id] = session
+        self.total_bytes += session["bytes"]
+        self._evict(now)
+        return session
+
+    def _drop(self, session_id: str) -> None:
+        session = self._sessions.pop(session_id)
+        self.total_bytes -= session["bytes"]
+
+    def _evict(self, now: float) -> None:
+        # The dict is in last-used order, so idle sessions are always at the front
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if now - session["last_used"] > self.ttl_seconds:
+                self.evicted_idle += 1
+            elif len(self._sessions) > self.max_sessions:
+                self.evicted_lru += 1
+            elif self.total_bytes > self.max_bytes and len(self._sessions) > 1:
+                self.evicted_memory += 1
+            else:
+                break
+            self._drop(session_id)
+
+    def _write(self, session_id: str, now: float, message: Optional[Dict[str, Any]] = None):
+        """
+        Append a message to the session on disk (or, without one, clear its
+        messages) in one transaction. Returns (seq given to the message,
+        version before the write, version after it).
+        """
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            row = self._db.execute(
+                "SELECT next_seq, version, cleared_seq, last_used FROM chat_sessions WHERE session_id = ?",
+                (session_id,)
+            ).fetchone()
+            next_seq, version, cleared_seq = row[:3] if row is not None else (0, 0, 0)
+            if message is None or (row is not None and now - row[3] > self.ttl_seconds):
+                # Cleared, or expired and starting over; seq keeps counting up
+                self._db.execute("DELETE FROM chat_messages WHERE session_id = ?", (session_id,))
+                cleared_seq = next_seq
+
+            seq = next_seq
+            if message is not None:
+                self._db.execute(
+                    "INSERT INTO chat_messages (session_id, seq, role, content) VALUES (?, ?, ?, ?)",
+                    (session_id, seq, message["role"], message["content"]),
+                )
+                next_seq += 1
+                self._db.execute(
+                    "DELETE FROM chat_messages WHERE session_id = ? AND seq < ?",
+                    (session_id, next_seq - self.max_messages),
+                )
+            self._db.execute(
+                "INSERT INTO chat_sessions (session_id, last_used, next_seq, version, cleared_seq) "
+                "VALUES (?, ?, ?, ?, ?) ON CONFLICT (session_id) DO UPDATE SET last_used = excluded.last_used, "
+                "next_seq = excluded.next_seq, version = excluded.version, cleared_seq = excluded.cleared_seq",
+                (session_id, now, next_seq, version + 1, cleared_seq),
+            )
+
+            self._writes += 1
+            if self._writes % PRUNE_EVERY_WRITES == 0:
+                cutoff = now - self.ttl_seconds
+                self._db.execute(
+                    "DELETE FROM chat_messages WHERE session_id IN "
+                    "(SELECT session_id FROM chat_sessions WHERE last_used < ?)", (cutoff,)
+                )
+                self._db.execute("DELETE FROM chat_sessions WHERE last_used < ?", (cutoff,))
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return seq, version, version + 1
+
+    def exists(self, session_id: str) -> bool:
+        with self._lock:
+            return self._load(session_id, time.time()) is not None
+
+    def get_history(self, session_id: str) -> List[Dict[str, Any]]:
+        """Recent messages of a session, oldest first; empty for unknown or expired sessions"""
+        with self._lock:
+            session = self._load(session_id, time.time())
+            return list(session["messages"]) if session is not None else []
+
+    def append(self, session_id: str, role: str, content: str) -> List[Dict[str, Any]]:
+        """Add a message, creating the session if needed, and return the updated history"""
+        now = time.time()
+        with self._lock:
+            session = self._load(session_id, now)
+            if session is None:
+                session = self._remember(session_id, [], now)
+                self.created += 1
+
+            message = {"role": role, "content": content, "seq": session["next_seq"]}
+            if self._db is not None:
+                message["seq"], previous, version = self._write(session_id, now, message)
+                if previous != session["version"]:
+                    # Another worker wrote since we loaded: the disk copy has its messages and ours
+                    return list(self._reload(session_id, now)["messages"])
+                session["version"] = version
+            session["next_seq"] = message["seq"] + 1
+            buffer = session["messages"]
+            dropped = []
+            if len(buffer) == buffer.maxlen:
+                dropped.append(buffer[0])
+                session["bytes"] -= self._size(buffer[0])
+                self.total_bytes -= self._size(buffer[0])
+            buffer.append(message)
+            session["bytes"] += self._size(message)
+            self.total_bytes += self._size(message)
+
+            self._dropped(session_id, dropped)
+            self._evict(now)
+            return list(buffer)
+
+    def reset(self, session_id: str) -> bool:
+        """Empty a session's history; False if there was no such session"""
+        now = time.time()
+        with self._lock:
+            session = self._load(session_id, now)
+            if session is None:
+                return False
+            if self._db is not None:
+                session["next_seq"], _, session["version"] = self._write(session_id, now)
+            session["cleared_seq"] = session["next_seq"]
+            self.total_bytes -= session["bytes"]
+            session["bytes"] = 0
+            session["messages"].clear()
+            self._was_reset(session_id)
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sessions.clear()
+            self.total_bytes = 0
+            if self._db is not None:
+                self._db.execute("DELETE FROM chat_messages")
+                self._db.execute("DELETE FROM chat_sessions")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "messages": sum(len(session["messages"]) for session in self._sessions.values()),
+                "bytes": self.total_bytes,
+                "max_sessions": self.max_sessions,
+                "max_messages_per_session": self.max_messages,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "disk_tier": self.db_path,
+                "created": self.created,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evicted_idle": self.evicted_idle,
+                "evicted_lru": self.evicted_lru,
+                "evicted_memory": self.evicted_memory,
+            }
+
+# Process-wide store for the chatbot's conversations
+session_store = SessionStore()
@@ -0,0 +1,49 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one.
+
+    The first caller for a key starts the work as a task; callers that
+    arrive while it is running await the same task instead of starting
+    their own. The work is shielded, so a caller that goes away does not
+    cancel it for the others. The key is released as soon as the task
+    finishes, so later calls start fresh (and usually hit the cache).
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, "asyncio.Task"] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def run(self, key: str, work: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._in_flight.get(key)
+        if task is not None and task.get_loop() is asyncio.get_running_loop():
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(work())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._release(key, done))
+            self.leaders += 1
+        return await asyncio.shield(task)
+
+    def _release(self, key: str, task: "asyncio.Task") -> None:
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # Retrieve the exception so a failure nobody awaited is not logged as unhandled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._in_flight),
+            "calls": calls,
+            "executed": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_fraction": round(self.coalesced / calls, 4) if calls else 0.0,
+        }
+
+# Shared by the Symptom Analyzer's Gemini calls
+analysis_flights = SingleFlight()
@@ -0,0 +1,351 @@
+import datetime
+import os
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Length of one appointment slot; slot index = minutes since midnight // SLOT_MINUTES
+SLOT_MINUTES = int(os.getenv("SLOT_MINUTES", "60"))
+
+# Slot states in the grid
+NOT_OFFERED = 0
+FREE = 1
+BOOKED = 2
+
+def time_to_minutes(value: str) -> int:
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def minutes_to_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+# slot length -> start-time and slot-id labels, shared by every schedule
+_labels: Dict[int, Tuple[List[str], List[str]]] = {}
+
+def slot_labels(slot_minutes: int) -> Tuple[List[str], List[str]]:
+    """Per slot index: ("HH:MM" start times, with the day's end appended), ("HHMM" slot id suffixes)"""
+    labels = _labels.get(slot_minutes)
+    if labels is None:
+        starts = range(0, 24 * 60 + 1, slot_minutes)
+        labels = _labels[slot_minutes] = ([minutes_to_time(m) for m in starts],
+                                          [minutes_to_time(m).replace(":", "") for m in starts])
+    return labels
+
+def make_slot_id(doctor_id: str, date: str, start_minutes: int) -> str:
+    """Deterministic slot id, e.g. "<doctor id>_20250301_0900"; no lookup table needed to resolve it"""
+    return f"{doctor_id}_{date.replace('-', '')}_{start_minutes // 60:02d}{start_minutes % 60:02d}"
+
+def parse_slot_id(slot_id: str) -> Optional[Tuple[str, str, int]]:
+    """(doctor id, YYYY-MM-DD date, start minutes) of a slot id, or None if it is not one"""
+    parts = slot_id.rsplit("_", 2)
+    if len(parts) != 3:
+        return None
+    doctor_id, day, start = parts
+    if len(day) != 8 or len(start) != 4 or not day.isdigit() or not start.isdigit():
+        return None
+    return doctor_id, f"{day[:4]}-{day[4:6]}-{day[6:]}", int(start[:2]) * 60 + int(start[2:])
+
+class DoctorSchedule:
+    """
+    One doctor's slots as a compact grid.
+
+    Each date is a row of SLOT_MINUTES-long slots covering the whole day:
+    one byte of state (not offered / free / booked) and one 32-bit version
+    per slot, in a bytearray and an array. Dates are kept sorted, so date
+    ranges are found by bisection. Slot dicts are only built when asked for.
+    """
+
+    __slots__ = ("doctor_id", "slot_minutes", "slots_per_day", "dates", "states", "versions", "_times", "_suffixes")
+
+    def __init__(self, doctor_id: str, slot_minutes: int = SLOT_MINUTES):
+        if 24 * 60 % slot_minutes:
+            raise ValueError(f"slot length must divide a day, got {slot_minutes} minutes")
+        self.doctor_id = doctor_id
+        self.slot_minutes = slot_minutes
+        self.slots_per_day = 24 * 60 // slot_minutes
+        self.dates: List[str] = []
+        self.states = bytearray()
+        self.versions = array("I")
+        self._times, self._suffixes = slot_labels(slot_minutes)
+
+    def slot_index(self, start_minutes: int) -> int:
+        if start_minutes % self.slot_minutes or not 0 <= start_minutes < 24 * 60:
+            raise ValueError(f"{minutes_to_time(start_minutes)} is not on the {self.slot_minutes}-minute slot grid")
+        return start_minutes // self.slot_minutes
+
+    def _row(self, date: str) -> Optional[int]:
+        row = bisect_left(self.dates, date)
+        if row < len(self.dates) and self.dates[row] == date:
+            return row
+        return None
+
+    def _add_row(self, date: str) -> int:
+        row = bisect_left(self.dates, date)
+        if row < len(self.dates) and self.dates[row] == date:
+            return row
+        offset = row * self.slots_per_day
+        self.dates.insert(row, date)
+        self.states[offset:offset] = bytes(self.slots_per_day)
+        self.versions[offset:offset] = array("I", bytes(4 * self.slots_per_day))
+        return row
+
+    def offer(self, date: str, start_minutes: int, available: bool = True, version: int = 0) -> None:
+        """Add one slot to the schedule (creating the date's row if needed)"""
+        position = self._add_row(date) * self.slots_per_day + self.slot_index(start_minutes)
+        self.states[position] = FREE if available else BOOKED
+        self.versions[position] = version
+
+    def _position(self, date: str, start_minutes: int) -> Optional[int]:
+        row = self._row(date)
+        if row is None or start_minutes % self.slot_minutes or not 0 <= start_minutes < 24 * 60:
+            return None
+        position = row * self.slots_per_day + start_minutes // self.slot_minutes
+        return position if self.states[position] != NOT_OFFERED else None
+
+    def _slot(self, id_prefix: str, index: int, state: int, version: int) -> Dict[str, Any]:
+        return {
+            "id": id_prefix + self._suffixes[index],
+            "startTime": self._times[index],
+            "endTime": self._times[index + 1],
+            "isAvailable": state == FREE,
+            "version": version,
+        }
+
+    def _id_prefix(self, date: str) -> str:
+        return f"{self.doctor_id}_{date.replace('-', '')}_"
+
+    def get_slot(self, date: str, start_minutes: int) -> Optional[Dict[str, Any]]:
+        position = self._position(date, start_minutes)
+        if position is None:
+            return None
+        return self._slot(self._id_prefix(date), position % self.slots_per_day,
+                          self.states[position], self.versions[position])
+
+    def set_available(self, date: str, start_minutes: int, available: bool) -> bool:
+        position = self._position(date, start_minutes)
+        if position is None:
+            return False
+        self.states[position] = FREE if available else BOOKED
+        self.versions[position] += 1
+        return True
+
+    def claim(self, date: str, start_minutes: int, version: int) -> bool:
+        """Compare-and-set: book the slot only if it is free and still at version"""
+        position = self._position(date, start_minutes)
+        if position is None or self.states[position] != FREE or self.versions[position] != version:
+            return False
+        self.states[position] = BOOKED
+        self.versions[position] += 1
+        return True
+
+    def rows(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> range:
+        """Row numbers of the dates within [start_date, end_date] (either end open)"""
+        first = bisect_left(self.dates, start_date) if start_date is not None else 0
+        last = bisect_right(self.dates, end_date) if end_date is not None else len(self.dates)
+        return range(first, max(first, last))
+
+    def availability(self, start_date: Optional[str] = None, end_date: Optional[str] = None,
+                     only_free: bool = False, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        The API's nested availability shape: [{"date", "timeSlots": [slot, ...]}, ...],
+        at most `limit` days. With only_free, booked slots and days without a
+        free slot are left out.
+        """
+        days = []
+        width = self.slots_per_day
+        for row in self.rows(start_date, end_date):
+            if limit is not None and len(days) >= limit:
+                break
+            base = row * width
+            if only_free and self.states.find(FREE, base, base + width) == -1:
+                continue
+            date = self.dates[row]
+            prefix = self._id_prefix(date)
+            days.append({
+                "date": date,
+                "timeSlots": [
+                    self._slot(prefix, index, state, version)
+                    for index, (state, version) in enumerate(zip(self.states[base:base + width],
+                                                                 self.versions[base:base + width]))
+                    if state == FREE or (state == BOOKED and not only_free)
+                ],
+            })
+        return days
+
+    def drop_before(self, date: str) -> int:
+        """Remove every date before `date`; returns the number of offered slots removed"""
+        rows = bisect_left(self.dates, date)
+        if not rows:
+            return 0
+        cells = rows * self.slots_per_day
+        removed = cells - self.states.count(NOT_OFFERED, 0, cells)
+        del self.dates[:rows]
+        del self.states[:cells]
+        del self.versions[:cells]
+        return removed
+
+    def roll_forward(self, first_date: str, last_date: str) -> List[Tuple[str, int]]:
+        """
+        Offer the latest day's slots again, all free, on each date after it
+        (but not before first_date) through last_date. Returns the new slots
+        as (date, start minutes).
+        """
+        if not self.dates:
+            return []
+        width = self.slots_per_day
+        template = [index * self.slot_minutes for index in range(width)
+                    if self.states[len(self.states) - width + index] != NOT_OFFERED]
+        day = max(datetime.date.fromisoformat(self.dates[-1]) + datetime.timedelta(days=1),
+                  datetime.date.fromisoformat(first_date))
+        last = datetime.date.fromisoformat(last_date)
+        added = []
+        while day <= last:
+            date = day.isoformat()
+            for start in template:
+                self.offer(date, start)
+                added.append((date, start))
+            day += datetime.timedelta(days=1)
+        return added
+
+    def free_slots(self) -> Iterable[Tuple[str, int]]:
+        """(date, start minutes) of every free slot, in time order"""
+        width = self.slots_per_day
+        for row, date in enumerate(self.dates):
+            base = row * width
+            position = self.states.find(FREE, base, base + width)
+            while position != -1:
+                yield date, (position - base) * self.slot_minutes
+                position = self.states.find(FREE, position + 1, base + width)
+
+    def add_days(self, days: Iterable[Dict[str, Any]]) -> None:
+        """Load days in the nested API shape; slot ids in them are ignored (ids are derived)"""
+        for day in days:
+            for slot in day["timeSlots"]:
+                start = time_to_minutes(slot["startTime"])
+                if time_to_minutes(slot["endTime"]) - start != self.slot_minutes:
+                    raise ValueError(
+                        f"slot {slot['startTime']}-{slot['endTime']} is not {self.slot_minutes} minutes long"
+                    )
+                self.offer(day["date"], start, slot.get("isAvailable", True), slot.get("version", 0))
+
+# Free-slot index keys: start minute (counted from day 0 of the proleptic calendar) above a doctor number
+DOCTOR_BITS = 32
+DOCTOR_MASK = (1 << DOCTOR_BITS) - 1
+
+def minute_of(date: str, start_minutes: int = 0) -> int:
+    return datetime.date.fromisoformat(date).toordinal() * 24 * 60 + start_minutes
+
+class FreeSlotIndex:
+    """
+    Every free slot, ordered by start time, in one sorted array per specialty.
+
+    An entry is a single int64 packing the slot's start minute and the
+    doctor's number, so the index costs eight bytes per free slot and ties
+    at one start time are ordered by doctor. Single changes (a booking, a
+    cancellation) are applied in place by bisection. Bulk loads append and
+    sort once, the next time the specialty is read or changed.
+    """
+
+    def __init__(self):
+        # specialty -> sorted keys
+        self._keys: Dict[str, array] = {}
+        self._unsorted: set = set()
+        self._numbers: Dict[str, int] = {}
+        self._doctor_ids: List[str] = []
+        self._specialties: List[str] = []
+
+    def __len__(self) -> int:
+        return sum(len(keys) for keys in self._keys.values())
+
+    def register(self, doctor_id: str, specialty: str) -> None:
+        """Give a doctor a number; a doctor added again loses their old entries"""
+        number = self._numbers.get(doctor_id)
+        if number is None:
+            self._numbers[doctor_id] = len(self._doctor_ids)
+            self._doctor_ids.append(doctor_id)
+            self._specialties.append(specialty)
+            return
+        for other, keys in self._keys.items():
+            self._keys[other] = array("q", (key for key in keys if key & DOCTOR_MASK != number))
+        self._specialties[number] = specialty
+
+    def _sorted(self, specialty: str) -> array:
+        keys = self._keys.setdefault(specialty, array("q"))
+        if specialty in self._unsorted:
+            keys = self._keys[specialty] = array("q", sorted(keys))
+            self._unsorted.discard(specialty)
+        return keys
+
+    def _key(self, doctor_id: str, date: str, start_minutes: int) -> Tuple[str, int]:
+        number = self._numbers[doctor_id]
+        return self._specialties[number], minute_of(date, start_minutes) << DOCTOR_BITS | number
+
+    def extend(self, doctor_id: str, slots: Iterable[Tuple[str, int]]) -> None:
+        """Bulk-add a doctor's free (date, start minutes) slots, e.g. when a doctor is loaded"""
+        number = self._numbers[doctor_id]
+        specialty = self._specialties[number]
+        keys = self._keys.setdefault(specialty, array("q"))
+        before = len(keys)
+        keys.extend(minute_of(date, start) << DOCTOR_BITS | number for date, start in slots)
+        if len(keys) > before:
+            self._unsorted.add(specialty)
+
+    def add(self, doctor_id: str, date: str, start_minutes: int) -> None:
+        specialty, key = self._key(doctor_id, date, start_minutes)
+        keys = self._sorted(specialty)
+        position = bisect_left(keys, key)
+        if position == len(keys) or keys[position] != key:
+            keys.insert(position, key)
+
+    def remove(self, doctor_id: str, date: str, start_minutes: int) -> None:
+        specialty, key = self._key(doctor_id, date, start_minutes)
+        keys = self._sorted(specialty)
+        position = bisect_left(keys, key)
+        if position < len(keys) and keys[position] == key:
+            del keys[position]
+
+    def drop_before(self, minute: int) -> int:
+        """Remove every entry starting before `minute`; returns how many were removed"""
+        removed = 0
+        for specialty in list(self._keys):
+            keys = self._sorted(specialty)
+            count = bisect_left(keys, minute << DOCTOR_BITS)
+            del keys[:count]
+            removed += count
+        return removed
+
+    def earliest(self, specialty: Optional[str], start_minute: int, end_minute: Optional[int], limit: int,
+                 doctor_ids: Optional[Iterable[str]] = None) -> List[Tuple[str, str, int]]:
+        """
+        The first `limit` free slots starting in [start_minute, end_minute), as
+        (doctor id, date, start minutes), optionally only for doctor_ids.
+        """
+        allowed = None
+        if doctor_ids is not None:
+            allowed = {self._numbers[doctor_id] for doctor_id in doctor_ids if doctor_id in self._numbers}
+            if not allowed:
+                return []
+        end_key = end_minute << DOCTOR_BITS if end_minute is not None else None
+
+        found: List[int] = []
+        for name in ([specialty] if specialty is not None else list(self._keys)):
+            if name not in self._keys:
+                continue
+            keys = self._sorted(name)
+            taken = 0
+            for position in range(bisect_left(keys, start_minute << DOCTOR_BITS), len(keys)):
+                key = keys[position]
+                if end_key is not None and key >= end_key:
+                    break
+                if allowed is None or key & DOCTOR_MASK in allowed:
+                    found.append(key)
+                    taken += 1
+                    if taken == limit:
+                        break
+        found.sort()
+
+        slots = []
+        for key in found[:limit]:
+            day, start = divmod(key >> DOCTOR_BITS, 24 * 60)
+            slots.append((self._doctor_ids[key & DOCTOR_MASK], datetime.date.fromordinal(day).isoformat(), start))
+        return slots
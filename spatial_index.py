@@ -0,0 +1,151 @@
+import math
+from collections import defaultdict
+from itertools import chain
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+# A little under the shortest real degree (~110.57 km at the equator) so bounding boxes never clip
+KM_PER_DEGREE = 110.0
+
+# Haversine (spherical) and geodesic (ellipsoidal) distances differ by less than 0.5%,
+# so candidates are kept with this much slack and the exact check is left to the caller
+HAVERSINE_SLACK = 1.005
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance on a spherical earth, in kilometers; works on scalars and NumPy arrays"""
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(np.subtract(lng2, lng1))
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+class GeoGridIndex:
+    """
+    Column-oriented store of doctor locations with a lat/lng grid on top.
+
+    Coordinates and specialty codes live in NumPy arrays indexed by row, so
+    distances for a whole candidate set are computed in one vectorized call.
+    A fixed-size grid of row numbers, kept per specialty, narrows a radius
+    query to the cells overlapping the search circle's bounding box. Inserts
+    append a row and removals leave a tombstone, so nothing is ever rebuilt.
+    """
+
+    ALL_SPECIALTIES = None
+
+    def __init__(self, cell_degrees: float = 0.1, initial_capacity: int = 1024):
+        self.cell_degrees = cell_degrees
+        self.lng_cells = int(round(360 / cell_degrees))
+
+        self.lat = np.empty(initial_capacity, dtype=np.float64)
+        self.lng = np.empty(initial_capacity, dtype=np.float64)
+        self.specialty_code = np.empty(initial_capacity, dtype=np.int32)
+        self.active = np.zeros(initial_capacity, dtype=bool)
+        self.ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._specialty_codes: Dict[str, int] = {}
+        self._specialties: List[str] = []
+
+        # specialty (None = every doctor) -> cell -> row numbers
+        self._cells: Dict[Optional[str], Dict[Tuple[int, int], List[int]]] = defaultdict(lambda: defaultdict(list))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (
+            math.floor(lat / self.cell_degrees),
+            math.floor(lng / self.cell_degrees) % self.lng_cells,
+        )
+
+    def _grow(self) -> None:
+        capacity = max(1, len(self.lat) * 2)
+        self.lat = np.resize(self.lat, capacity)
+        self.lng = np.resize(self.lng, capacity)
+        self.specialty_code = np.resize(self.specialty_code, capacity)
+        active = np.zeros(capacity, dtype=bool)
+        active[:len(self.active)] = self.active
+        self.active = active
+
+    def insert(self, doctor_id: str, lat: float, lng: float, specialty: str) -> None:
+        if doctor_id in self._rows:
+            self.remove(doctor_id)
+
+        row = len(self.ids)
+        if row >= len(self.lat):
+            self._grow()
+
+        code = self._specialty_codes.get(specialty)
+        if code is None:
+            code = self._specialty_codes[specialty] = len(self._specialties)
+            self._specialties.append(specialty)
+
+        self.lat[row] = lat
+        self.lng[row] = lng
+        self.specialty_code[row] = code
+        self.active[row] = True
+        self.ids.append(doctor_id)
+        self._rows[doctor_id] = row
+
+        cell = self._cell(lat, lng)
+        self._cells[specialty][cell].append(row)
+        self._cells[self.ALL_SPECIALTIES][cell].append(row)
+
+    def remove(self, doctor_id: str) -> None:
+        row = self._rows.pop(doctor_id, None)
+        if row is None:
+            return
+
+        self.active[row] = False
+        cell = self._cell(self.lat[row], self.lng[row])
+        specialty = self._specialties[self.specialty_code[row]]
+        for key in (specialty, self.ALL_SPECIALTIES):
+            cell_rows = self._cells[key].get(cell)
+            if cell_rows is not None:
+                cell_rows.remove(row)
+                if not cell_rows:
+                    del self._cells[key][cell]
+
+    def _cells_in_radius(self, lat: float, lng: float, radius_km: float) -> Tuple[range, List[int]]:
+        dlat = radius_km / KM_PER_DEGREE
+        lat_min = max(-90.0, lat - dlat)
+        lat_max = min(90.0, lat + dlat)
+
+        # Longitude degrees shrink towards the poles; near them, scan every column
+        cos_lat = min(math.cos(math.radians(lat_min)), math.cos(math.radians(lat_max)))
+        if cos_lat <= 1e-6 or radius_km / (KM_PER_DEGREE * cos_lat) >= 180:
+            lng_columns = list(range(self.lng_cells))
+        else:
+            dlng = radius_km / (KM_PER_DEGREE * cos_lat)
+            first = math.floor((lng - dlng) / self.cell_degrees)
+            last = math.floor((lng + dlng) / self.cell_degrees)
+            lng_columns = [column % self.lng_cells for column in range(first, last + 1)]
+
+        rows = range(math.floor(lat_min / self.cell_degrees), math.floor(lat_max / self.cell_degrees) + 1)
+        return rows, lng_columns
+
+    def query(self, lat: float, lng: float, radius_km: float, specialty: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, haversine_km) arrays for doctors that may lie within radius_km"""
+        cells = self._cells.get(specialty)
+        if radius_km < 0 or not cells:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+        limit = radius_km * HAVERSINE_SLACK
+        grid_rows, grid_columns = self._cells_in_radius(lat, lng, limit)
+        if len(grid_rows) * len(grid_columns) > len(cells):
+            # Huge radius: one vectorized pass over the columns beats probing empty cells
+            count = len(self.ids)
+            mask = self.active[:count].copy()
+            if specialty is not self.ALL_SPECIALTIES:
+                mask &= self.specialty_code[:count] == self._specialty_codes[specialty]
+            candidates = np.flatnonzero(mask)
+        else:
+            cell_rows = [cells[(row, column)] for row in grid_rows for column in grid_columns if (row, column) in cells]
+            candidates = np.fromiter(chain.from_iterable(cell_rows), dtype=np.int64)
+
+        distances = haversine_km(lat, lng, self.lat[candidates], self.lng[candidates])
+        keep = distances <= limit
+        return candidates[keep], distances[keep]
@@ -0,0 +1,8 @@
+// Base URLs of the backend services. Set VITE_API_GATEWAY to send every call through the
+// single-process gateway instead (gateway.py): either its URL, e.g. http://localhost:8080,
+// or /gateway to go through the Vite dev-server proxy and avoid cross-origin requests entirely.
+const gateway = import.meta.env.VITE_API_GATEWAY as string | undefined;
+
+export const SYMPTOM_ANALYZER_URL = gateway ? `${gateway}/analyzer` : 'http://localhost:8000';
+export const HEALTH_ASSISTANT_URL = gateway ? `${gateway}/assistant` : 'http://localhost:8001';
+export const APPOINTMENT_API_URL = gateway ? `${gateway}/appointments` : 'http://localhost:8002';
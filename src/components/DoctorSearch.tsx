@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { Search, MapPin, Filter, X } from 'lucide-react';
+import { APPOINTMENT_API_URL } from '../api';
 
 interface Location {
   lat: number;
@@ -53,7 +54,7 @@ export const DoctorSearch: React.FC<DoctorSearchProps> = ({ onSelectDoctor, init
 
   const fetchSpecialties = async () => {
     try {
-      const response = await fetch('http://localhost:8002/api/specialties');
+      const response = await fetch(`${APPOINTMENT_API_URL}/api/specialties`);
       if (!response.ok) {
         throw new Error(`Error: ${response.status}`);
       }
@@ -138,7 +139,7 @@ export const DoctorSearch: React.FC<DoctorSearchProps> = ({ onSelectDoctor, init
         params.append('specialty', specialty);
       }
 
-      const response = await fetch(`http://localhost:8002/api/doctors/search?${params}`);
+      const response = await fetch(`${APPOINTMENT_API_URL}/api/doctors/search?${params}`);
       
       if (!response.ok) {
         throw new Error(`Error: ${response.status}`);
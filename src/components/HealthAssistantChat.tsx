@@ -1,6 +1,8 @@
 import React, { useState, useRef, useEffect } from 'react';
 import { motion } from 'framer-motion';
 import { Send, Bot, User, X, Minimize2, Maximize2, RefreshCw, XCircle } from 'lucide-react';
+import { readServerSentEvents } from '../sse';
+import { HEALTH_ASSISTANT_URL } from '../api';
 
 interface Message {
   id: string;
@@ -87,9 +89,25 @@ export const HealthAssistantChat: React.FC<ChatProps> = ({ apiKey, onClose }) =>
     setIsLoading(true);
     setError(null);
     
+    const assistantMessageId = (Date.now() + 1).toString();
+    const setAssistantText = (text: string) => {
+      setMessages(prev => {
+        const assistantMessage: Message = {
+          id: assistantMessageId,
+          text,
+          sender: 'assistant',
+          timestamp: new Date()
+        };
+        const exists = prev.some(message => message.id === assistantMessageId);
+        return exists
+          ? prev.map(message => (message.id === assistantMessageId ? assistantMessage : message))
+          : [...prev, assistantMessage];
+      });
+    };
+    
     try {
-      // Make API call to the chatbot backend
-      const response = await fetch('http://localhost:8001/chat', {
+      // Make API call to the chatbot backend; the reply streams in chunk by chunk
+      const response = await fetch(`${HEALTH_ASSISTANT_URL}/chat/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -105,35 +123,26 @@ export const HealthAssistantChat: React.FC<ChatProps> = ({ apiKey, onClose }) =>
         throw new Error(`Error from server: ${response.status} ${response.statusText}`);
       }
       
-      const data = await response.json();
-      
-      // Save the session ID for future requests
-      if (data.session_id) {
-        setSessionId(data.session_id);
+      let reply = '';
+      for await (const { event, data } of readServerSentEvents(response)) {
+        if (event === 'session' && data.session_id) {
+          // Save the session ID for future requests
+          setSessionId(data.session_id);
+        } else if (event === 'message') {
+          reply += data.text ?? '';
+          setAssistantText(reply);
+        } else if (event === 'done') {
+          setAssistantText(data.response || "I'm sorry, I couldn't process your request.");
+        } else if (event === 'error') {
+          throw new Error(data.detail ?? 'Failed to communicate with the assistant');
+        }
       }
-      
-      // Add assistant response
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: data.response || "I'm sorry, I couldn't process your request.",
-        sender: 'assistant',
-        timestamp: new Date()
-      };
-      
-      setMessages(prev => [...prev, assistantMessage]);
     } catch (err) {
       console.error('Error sending message:', err);
       setError(err instanceof Error ? err.message : 'Failed to communicate with the assistant');
       
-      // Add error message
-      const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        text: "I'm sorry, I encountered an error. Please try again later.",
-        sender: 'assistant',
-        timestamp: new Date()
-      };
-      
-      setMessages(prev => [...prev, errorMessage]);
+      // Replace any partial reply with an error message
+      setAssistantText("I'm sorry, I encountered an error. Please try again later.");
     } finally {
       setIsLoading(false);
     }
@@ -146,7 +155,7 @@ export const HealthAssistantChat: React.FC<ChatProps> = ({ apiKey, onClose }) =>
     
     try {
       // Call the reset endpoint
-      const response = await fetch('http://localhost:8000/reset', {
+      const response = await fetch(`${HEALTH_ASSISTANT_URL}/reset`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -3,6 +3,8 @@ import { motion, AnimatePresence } from 'framer-motion';
 import { Search, Plus, MessageCircle } from 'lucide-react';
 import { VoiceInput } from './VoiceInput';
 import { HealthAssistantChat } from './HealthAssistantChat';
+import { readServerSentEvents } from '../sse';
+import { SYMPTOM_ANALYZER_URL } from '../api';
 
 interface Symptom {
   id: string;
@@ -50,9 +52,8 @@ export const SymptomChecker = () => {
         ...selectedSymptoms.map(s => s.name)
       ].filter(Boolean).join(', ');
       
-      // Make the API call to the FastAPI backend
-      
-      const response = await fetch('http://localhost:8000/analyze', {
+      // Make the API call to the FastAPI backend and render the analysis as it streams in
+      const response = await fetch(`${SYMPTOM_ANALYZER_URL}/analyze/stream`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -67,8 +68,21 @@ export const SymptomChecker = () => {
         throw new Error(`Error from server: ${response.status} ${response.statusText}`);
       }
       
-      const data = await response.json();
-      setAnalysisResult(data);
+      let extractedSymptoms = '';
+      let diagnosis: string | null = null;
+      for await (const { event, data } of readServerSentEvents(response)) {
+        if (event === 'extracted_symptoms') {
+          extractedSymptoms += data.text ?? '';
+        } else if (event === 'diagnosis') {
+          diagnosis = (diagnosis ?? '') + (data.text ?? '');
+        } else if (event === 'done') {
+          extractedSymptoms = data.extracted_symptoms ?? extractedSymptoms;
+          diagnosis = data.diagnosis;
+        } else if (event === 'error') {
+          throw new Error(data.detail ?? 'Failed to analyze symptoms');
+        }
+        setAnalysisResult({ extracted_symptoms: extractedSymptoms, diagnosis });
+      }
     } catch (err) {
       console.error('Error analyzing symptoms:', err);
       setError(err instanceof Error ? err.message : 'Failed to analyze symptoms');
@@ -0,0 +1,43 @@
+export interface ServerSentEvent {
+  event: string;
+  data: Record<string, string | null>;
+}
+
+// Reads a text/event-stream response body and yields each event as it arrives.
+// The backend JSON-encodes every data payload, so newlines in model output survive.
+export async function* readServerSentEvents(response: Response): AsyncGenerator<ServerSentEvent> {
+  if (!response.body) {
+    return;
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true }).replace(/\r\n/g, '\n');
+
+    let boundary = buffer.indexOf('\n\n');
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf('\n\n');
+
+      let event = 'message';
+      const dataLines: string[] = [];
+      for (const line of rawEvent.split('\n')) {
+        if (line.startsWith('event:')) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith('data:')) {
+          dataLines.push(line.slice(5).trim());
+        }
+      }
+
+      if (dataLines.length > 0) {
+        yield { event, data: JSON.parse(dataLines.join('\n')) };
+      }
+    }
+  }
+}
@@ -0,0 +1,12 @@
+import json
+from typing import Any
+
+# Headers that stop proxies (e.g. nginx) from buffering an event stream
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+def format_sse_event(event: str, data: Any) -> str:
+    """Encode one Server-Sent Event; data is JSON so newlines in model output survive"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
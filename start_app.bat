@@ -19,7 +19,7 @@ echo Checking required packages...
 python -c "import fastapi, uvicorn, google.generativeai" >nul 2>nul
 if %ERRORLEVEL% neq 0 (
     echo Installing required packages...
-    pip install -r requirements.txt
+    pip install -r requirements-services.txt
 )
 
 REM Run the services
@@ -1,52 +1,60 @@
+import argparse
+import asyncio
 import os
 import sys
-import subprocess
-import time
+
+from service_launcher import (
+    ManagedService, ServiceSupervisor, add_launch_arguments, run_in_daemon_thread, wait_until_healthy
+)
+
+async def print_instructions(service):
+    """Once the service answers /health, print where to reach it"""
+    print("Waiting for service to start...")
+    if not await run_in_daemon_thread(wait_until_healthy, service.url + "/health"):
+        print("⚠️ The service is not responding to health checks yet; check the output above")
+        return
+
+    # Print instructions
+    print("\n" + "=" * 60)
+    print("Symptom Analyzer API is running!")
+    print("=" * 60)
+    print("API URL: http://localhost:8000")
+    print("Health check: http://localhost:8000/health")
+    print("Readiness check: http://localhost:8000/ready")
+    print("Analyze endpoint: http://localhost:8000/analyze (POST)")
+    print("Batch endpoint: http://localhost:8000/analyze/batch (POST, JSONL)")
+    print("=" * 60)
+    print("Press Ctrl+C to stop the service")
 
 def main():
     """Start the Symptom Analyzer API service"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    add_launch_arguments(parser)
+    args = parser.parse_args()
+
     print("Starting Symptom Analyzer API service...")
-    
+
     # Ensure we're in the correct directory
     script_dir = os.path.dirname(os.path.abspath(__file__))
     os.chdir(script_dir)
     print(f"Working directory: {os.getcwd()}")
-    
+
     # Start the service
-    cmd = ["uvicorn", "feature1_fastapi:app", "--host", "0.0.0.0", "--port", "8000", "--reload"]
-    print(f"Running command: {' '.join(cmd)}")
-    
+    service = ManagedService(
+        "Symptom Analyzer API", "feature1_fastapi:app", 8000,
+        workers=args.workers, mode=args.mode, workers_env="ANALYZER_WORKERS", drain_seconds=args.drain
+    )
+    print(f"Running command: {' '.join(service.command)}")
+
     try:
-        # Run the service
-        process = subprocess.Popen(cmd)
-        
-        # Wait for the service to start
-        print("Waiting for service to start...")
-        time.sleep(2)
-        
-        # Print instructions
-        print("\n" + "=" * 60)
-        print("Symptom Analyzer API is running!")
-        print("=" * 60)
-        print("API URL: http://localhost:8000")
-        print("Health check: http://localhost:8000/health")
-        print("Analyze endpoint: http://localhost:8000/analyze (POST)")
-        print("=" * 60)
-        print("Press Ctrl+C to stop the service")
-        
-        # Keep the script running
-        process.wait()
-        
-    except KeyboardInterrupt:
-        print("\nStopping service...")
-        process.terminate()
-        process.wait(timeout=5)
+        # Ctrl+C / SIGTERM let in-flight requests finish before the service stops
+        asyncio.run(ServiceSupervisor([service]).run(after_start=lambda: print_instructions(service)))
         print("Service stopped")
     except Exception as e:
         print(f"Error: {str(e)}")
         return 1
-    
+
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,89 @@
+import gzip
+import hashlib
+import os
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is always available
+    brotli = None
+
+class StaticAsset:
+    """
+    A file read once, precompressed, and served from memory.
+
+    The first request loads the file and builds gzip (and brotli, when the
+    package is installed) variants. After that every response is built from
+    the cached bytes and answers conditional requests with 304 via a content
+    ETag or the file's Last-Modified time.
+    """
+
+    def __init__(self, path: str, media_type: str = "text/html; charset=utf-8"):
+        self.path = path
+        self.media_type = media_type
+        self._lock = threading.Lock()
+        self._variants: Optional[Dict[str, bytes]] = None
+        self.etag = ""
+        self.last_modified = ""
+        self._mtime = 0
+
+    def _load(self) -> Dict[str, bytes]:
+        with self._lock:
+            if self._variants is None:
+                with open(self.path, "rb") as f:
+                    body = f.read()
+                self._mtime = int(os.path.getmtime(self.path))
+                self.last_modified = formatdate(self._mtime, usegmt=True)
+                self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+                variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    variants["br"] = brotli.compress(body, quality=11)
+                self._variants = variants
+        return self._variants
+
+    def _not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return if_none_match.strip() == "*" or self.etag in [tag.strip() for tag in if_none_match.split(",")]
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return self._mtime <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    @staticmethod
+    def _encoding(request: Request, variants: Dict[str, bytes]) -> str:
+        accepted = {
+            part.split(";")[0].strip().lower()
+            for part in request.headers.get("accept-encoding", "").split(",")
+            if not part.strip().endswith("q=0")
+        }
+        for encoding in ("br", "gzip"):
+            if encoding in variants and encoding in accepted:
+                return encoding
+        return "identity"
+
+    def response(self, request: Request) -> Response:
+        variants = self._load()
+        headers = {
+            "ETag": self.etag,
+            "Last-Modified": self.last_modified,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if self._not_modified(request):
+            return Response(status_code=304, headers=headers)
+
+        encoding = self._encoding(request, variants)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=variants[encoding], media_type=self.media_type, headers=headers)
@@ -0,0 +1,202 @@
+import os
+import re
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Turn the local prefilter off (SYMPTOM_PREFILTER=0) to send every input to Gemini
+SYMPTOM_PREFILTER = os.getenv("SYMPTOM_PREFILTER", "1") == "1"
+
+# Latency samples kept for the p50/p99 of locally served requests
+PREFILTER_LATENCY_SAMPLES = int(os.getenv("PREFILTER_LATENCY_SAMPLES", "1000"))
+
+# The same answer the extraction prompt asks Gemini to give
+NO_SYMPTOMS = "No symptoms detected."
+
+# Canonical symptom -> common phrasings (lower case, matched on whole words)
+SYMPTOM_LEXICON = {
+    "Fever": ["fever", "feverish", "high temperature", "temperature", "running a temperature", "pyrexia"],
+    "Chills": ["chills", "shivering", "shivers"],
+    "Sore throat": ["sore throat", "throat pain", "scratchy throat", "painful throat", "throat hurts"],
+    "Cough": ["cough", "coughing", "dry cough", "wet cough", "productive cough"],
+    "Runny nose": ["runny nose", "running nose", "nasal discharge"],
+    "Nasal congestion": ["stuffy nose", "blocked nose", "nasal congestion", "congestion", "congested"],
+    "Sneezing": ["sneezing", "sneeze", "sneezes"],
+    "Headache": ["headache", "headaches", "head ache", "head hurts", "migraine", "migraines"],
+    "Fatigue": ["fatigue", "tired", "tiredness", "exhausted", "exhaustion", "lethargy", "lethargic", "no energy"],
+    "Weakness": ["weakness", "weak"],
+    "Dizziness": ["dizzy", "dizziness", "lightheaded", "light headed", "vertigo"],
+    "Fainting": ["fainting", "fainted", "passed out", "blackout", "blacked out"],
+    "Nausea": ["nausea", "nauseous", "nauseated", "queasy", "feel sick"],
+    "Vomiting": ["vomiting", "vomit", "vomited", "throwing up", "threw up"],
+    "Diarrhea": ["diarrhea", "diarrhoea", "loose stools", "loose motions"],
+    "Constipation": ["constipation", "constipated"],
+    "Abdominal pain": ["abdominal pain", "stomach ache", "stomachache", "stomach pain", "tummy ache", "belly pain", "stomach cramps", "cramps"],
+    "Bloating": ["bloating", "bloated"],
+    "Heartburn": ["heartburn", "acid reflux", "indigestion"],
+    "Loss of appetite": ["loss of appetite", "no appetite", "not hungry"],
+    "Chest pain": ["chest pain", "chest hurts", "chest tightness", "tight chest", "chest pressure"],
+    "Shortness of breath": ["shortness of breath", "short of breath", "breathless", "breathlessness", "difficulty breathing", "trouble breathing", "can t breathe"],
+    "Wheezing": ["wheezing", "wheeze"],
+    "Palpitations": ["palpitations", "heart racing", "racing heart", "heart pounding"],
+    "Back pain": ["back pain", "backache", "back ache", "back hurts", "lower back pain"],
+    "Neck pain": ["neck pain", "stiff neck", "neck hurts"],
+    "Joint pain": ["joint pain", "joint pains", "aching joints", "sore joints"],
+    "Muscle pain": ["muscle pain", "muscle aches", "body aches", "body ache", "sore muscles", "aching muscles", "myalgia"],
+    "Swelling": ["swelling", "swollen"],
+    "Rash": ["rash", "rashes", "hives", "red spots"],
+    "Itching": ["itching", "itchy", "itch"],
+    "Earache": ["earache", "ear ache", "ear pain", "ear hurts"],
+    "Toothache": ["toothache", "tooth ache", "tooth pain"],
+    "Blurred vision": ["blurred vision", "blurry vision", "vision is blurry"],
+    "Red eyes": ["red eyes", "itchy eyes", "watery eyes", "pink eye"],
+    "Numbness": ["numbness", "numb", "tingling", "pins and needles"],
+    "Insomnia": ["insomnia", "can t sleep", "trouble sleeping", "sleeplessness"],
+    "Anxiety": ["anxiety", "anxious", "panic attacks", "panic attack"],
+    "Frequent urination": ["frequent urination", "peeing a lot", "urinating often"],
+    "Painful urination": ["painful urination", "burning urination", "burns when i pee"],
+    "Weight loss": ["weight loss", "losing weight", "lost weight"],
+    "Night sweats": ["night sweats", "sweating at night"],
+    "Sweating": ["sweating", "sweats", "sweaty"],
+    "Loss of smell or taste": ["loss of smell", "loss of taste", "can t smell", "can t taste"],
+}
+
+# Greetings, thanks and other small talk. Input made only of these words is
+# recognized as non-medical and answered locally; anything else goes to Gemini.
+SMALL_TALK_WORDS = {
+    "hi", "hello", "hey", "hiya", "yo", "greetings", "good", "morning", "afternoon", "evening", "day", "night",
+    "thanks", "thank", "thx", "ty", "you", "cheers", "ok", "okay", "k", "cool", "great", "nice", "bye",
+    "goodbye", "see", "ya", "later", "there", "how", "are", "what", "s", "up", "test", "testing", "please",
+    "yes", "yeah", "yep", "sure", "lol", "hmm",
+}
+
+# Words that may surround symptoms without adding anything Gemini would extract.
+# Negations ("no", "not", "without") are deliberately absent, so "no fever" goes to Gemini.
+FILLER_WORDS = {
+    "i", "im", "m", "ve", "have", "has", "had", "having", "got", "gotten", "get", "getting", "a", "an", "the",
+    "and", "also", "plus", "with", "my", "me", "some", "since", "for", "bit", "little", "lot", "of", "bad",
+    "really", "very", "quite", "mild", "slight", "severe", "terrible", "constant", "am", "is", "are", "been",
+    "was", "it", "today", "yesterday", "tonight", "morning", "night", "last", "this", "past", "few", "two",
+    "three", "days", "day", "week", "weeks", "hours", "all", "too", "s", "persistent", "can",
+}
+
+TOKEN_PATTERN = re.compile(r"[a-z]+")
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_PATTERN.findall(text.casefold())
+
+class SymptomLexicon:
+    """
+    Word-level trie over the symptom phrasings.
+
+    scan() walks the tokens once and takes the longest phrase starting at
+    each position, so "sore throat" wins over a bare "sore".
+    """
+
+    def __init__(self, lexicon: Dict[str, List[str]] = SYMPTOM_LEXICON):
+        self.root: Dict[str, Any] = {}
+        for symptom, phrases in lexicon.items():
+            for phrase in phrases:
+                node = self.root
+                for token in tokenize(phrase):
+                    node = node.setdefault(token, {})
+                node[None] = symptom
+
+    def scan(self, tokens: List[str]):
+        """(symptoms in order of first mention, token positions covered by a phrase)"""
+        symptoms: List[str] = []
+        covered = set()
+        position = 0
+        while position < len(tokens):
+            node, match, match_end = self.root, None, position
+            for end in range(position, len(tokens)):
+                node = node.get(tokens[end])
+                if node is None:
+                    break
+                if None in node:
+                    match, match_end = node[None], end + 1
+            if match is None:
+                position += 1
+                continue
+            if match not in symptoms:
+                symptoms.append(match)
+            covered.update(range(position, match_end))
+            position = match_end
+        return symptoms, covered
+
+class SymptomPrefilter:
+    """
+    Answers the symptom-extraction step locally when it safely can.
+
+    check() returns the extraction text to use instead of a Gemini call, or
+    None when the input must go to Gemini:
+    - empty input, or small talk only ("hi", "thanks!"), gets NO_SYMPTOMS
+      (no remote call at all)
+    - input made only of known phrasings and filler words ("fever and sore
+      throat since yesterday") gets the symptoms as a list (diagnosis still
+      goes to Gemini)
+    Anything else goes to Gemini as before, including negated phrases and
+    conditions the lexicon does not know ("I think I have the flu"): a
+    missing lexicon match never means no symptoms.
+    The lexicon is English only; set SYMPTOM_PREFILTER=0 for other languages.
+    """
+
+    def __init__(self, lexicon: Optional[SymptomLexicon] = None, enabled: bool = SYMPTOM_PREFILTER,
+                 latency_samples: int = PREFILTER_LATENCY_SAMPLES):
+        self.lexicon = lexicon or SymptomLexicon()
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._local_latencies_ms = deque(maxlen=latency_samples)
+        self.requests = 0
+        self.no_symptoms = 0
+        self.pre_extracted = 0
+        self.passed_through = 0
+
+    def check(self, text: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        tokens = tokenize(text)
+        if not tokens:
+            return NO_SYMPTOMS
+        if SMALL_TALK_WORDS.issuperset(tokens):
+            return NO_SYMPTOMS
+        symptoms, covered = self.lexicon.scan(tokens)
+        if not symptoms:
+            return None
+        for position, token in enumerate(tokens):
+            if position not in covered and token not in FILLER_WORDS:
+                return None
+        return "\n".join(f"- {symptom}" for symptom in symptoms)
+
+    def record(self, extraction: Optional[str], started: float, finished: Optional[float] = None) -> None:
+        """Count one request; `finished` is set when it was answered without any remote call"""
+        with self._lock:
+            self.requests += 1
+            if extraction is None:
+                self.passed_through += 1
+            elif extraction == NO_SYMPTOMS:
+                self.no_symptoms += 1
+            else:
+                self.pre_extracted += 1
+            if finished is not None:
+                self._local_latencies_ms.append((finished - started) * 1000)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            latencies = sorted(self._local_latencies_ms)
+            requests = self.requests
+            stats = {
+                "enabled": self.enabled,
+                "requests": requests,
+                "served_locally": self.no_symptoms,
+                "served_locally_fraction": round(self.no_symptoms / requests, 4) if requests else 0.0,
+                "extraction_local": self.pre_extracted,
+                "passed_through": self.passed_through,
+            }
+        if latencies:
+            stats["local_p50_ms"] = round(latencies[len(latencies) // 2], 3)
+            stats["local_p99_ms"] = round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))], 3)
+        return stats
+
+# Shared prefilter for the symptom analyzer
+symptom_prefilter = SymptomPrefilter()
@@ -4,6 +4,16 @@ import react from '@vitejs/plugin-react';
 // https://vitejs.dev/config/
 export default defineConfig({
   plugins: [react()],
+  server: {
+    // With VITE_API_GATEWAY=/gateway the app calls the gateway (gateway.py) through this proxy,
+    // so every API request is same-origin and needs no CORS preflight
+    proxy: {
+      '/gateway': {
+        target: 'http://localhost:8080',
+        rewrite: (path) => path.replace(/^\/gateway/, ''),
+      },
+    },
+  },
   // optimizeDeps: {
   //   exclude: ['lucide-react'],
   // },